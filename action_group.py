@@ -0,0 +1,116 @@
+"""
+action_group.py
+动作组存储：所有帧连续存放在一个 uint16 数组中，每帧 48 个值（24 路角度 + 24 路时间），
+相当于形状 (n_frames, 48) 的二维数组；支持摊还 O(1) 追加、切片与整体读写
+"""
+import sys
+from array import array
+from servo_controller import SERVO_COUNT
+
+FRAME_WIDTH = SERVO_COUNT * 2
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 可选，仅 as_numpy 使用
+    np = None
+
+
+class ActionFrame:
+    def __init__(self, angles, times):
+        self.angles = angles  # list[int]
+        self.times = times    # list[int]
+
+
+class ActionGroup:
+    def __init__(self):
+        self.data = array("H")
+
+    def __len__(self):
+        return len(self.data) // FRAME_WIDTH
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        """整数下标返回 ActionFrame（拷贝），切片返回新的 ActionGroup"""
+        n = len(self)
+        if isinstance(index, slice):
+            group = ActionGroup()
+            start, stop, step = index.indices(n)
+            if step == 1:
+                group.data = self.data[start * FRAME_WIDTH:max(start, stop) * FRAME_WIDTH]
+            else:
+                for i in range(start, stop, step):
+                    group.data.extend(self.row(i))
+            return group
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("帧下标越界")
+        row = self.row(index)
+        return ActionFrame(row[:SERVO_COUNT].tolist(), row[SERVO_COUNT:].tolist())
+
+    def row(self, index: int) -> array:
+        """第 index 帧的 48 个原始值"""
+        base = index * FRAME_WIDTH
+        return self.data[base:base + FRAME_WIDTH]
+
+    @property
+    def frames(self):
+        """兼容旧接口：以 ActionFrame 列表形式返回全部帧"""
+        return list(self)
+
+    def add_frame(self, angles, times):
+        if len(angles) != SERVO_COUNT or len(times) != SERVO_COUNT:
+            raise ValueError(f"每帧需要 {SERVO_COUNT} 路角度与时间")
+        self.data.extend(angles)
+        self.data.extend(times)
+
+    def clear(self):
+        self.data = array("H")
+
+    def to_lines(self):
+        return [",".join(map(str, self.row(i))) for i in range(len(self))]
+
+    def from_lines(self, lines):
+        data = array("H")
+        for line in lines:
+            values = line.strip().split(",")
+            if len(values) == FRAME_WIDTH:
+                data.extend(map(int, values))
+        self.data = data
+
+    def to_bytes(self) -> bytes:
+        """小端 uint16 原始数据"""
+        if sys.byteorder == "little":
+            return self.data.tobytes()
+        data = array("H", self.data)
+        data.byteswap()
+        return data.tobytes()
+
+    def from_bytes(self, raw):
+        if len(raw) % (FRAME_WIDTH * 2):
+            raise ValueError("数据长度不是整数帧")
+        data = array("H")
+        data.frombytes(raw)
+        if sys.byteorder != "little":
+            data.byteswap()
+        self.data = data
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            self.from_bytes(f.read())
+
+    def as_numpy(self):
+        """
+        (n_frames, 48) uint16 数组副本（需要 NumPy）
+        返回副本而不是 frombuffer 视图：视图存活期间 array 无法扩容，add_frame 会抛 BufferError
+        """
+        if np is None:
+            raise RuntimeError("as_numpy 需要安装 numpy")
+        return np.frombuffer(self.data, dtype=np.uint16).reshape(-1, FRAME_WIDTH).copy()
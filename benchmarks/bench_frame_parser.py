@@ -0,0 +1,54 @@
+"""
+bench_frame_parser.py
+FrameParser 吞吐量测试：模拟轮询 24 个舵机的应答流（夹杂少量噪声），
+按不同读取块大小喂入解析器，输出 MB/s 与 帧/s
+用法：python benchmarks/bench_frame_parser.py [总字节数MB]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servo_controller import FrameParser, checksum, CMD_POS_READ, CMD_TEMP_READ  # noqa: E402
+
+
+def make_stream(size: int, noise: float = 0.01, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    out = bytearray()
+    while len(out) < size:
+        sid = rng.randint(1, 24)
+        if rng.random() < 0.8:
+            body = bytearray([sid, 5, CMD_POS_READ]) + rng.randint(0, 1000).to_bytes(2, "little")
+        else:
+            body = bytearray([sid, 4, CMD_TEMP_READ, rng.randint(20, 80)])
+        out += b"\x55\x55" + body + bytes([checksum(body)])
+        if rng.random() < noise:
+            out += bytes(rng.randint(0, 255) for _ in range(rng.randint(1, 5)))
+    return bytes(out)
+
+
+def run(stream: bytes, chunk: int):
+    parser = FrameParser()
+    frames = 0
+    view = memoryview(stream)
+    t0 = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        for _ in parser.iter_frames(view[i:i + chunk]):
+            frames += 1
+    elapsed = time.perf_counter() - t0
+    return len(stream) / elapsed / 1e6, frames / elapsed
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    stream = make_stream(int(size_mb * 1e6))
+    print(f"stream: {len(stream) / 1e6:.1f} MB")
+    for chunk in (8, 64, 512, 4096):
+        mbps, fps = run(stream, chunk)
+        print(f"chunk={chunk:5d}  {mbps:7.2f} MB/s  {fps / 1e3:9.1f} k帧/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_script_parser.py
+对比旧的逐行正则解析（DanceEditor.play_all_frames 原实现）与 script_parser 一次扫描解析
+用法：python benchmarks/bench_script_parser.py [行数]
+"""
+import gc
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_parser import parse_script  # noqa: E402
+
+
+def make_script(lines: int) -> str:
+    out = []
+    for i in range(lines):
+        if i % 25 == 24:
+            out.append(f"HAL_Delay({(i % 7 + 1) * 10});  //{i + 1:02d}")
+        else:
+            out.append(f"Servo_Do({i % 24 + 1}, {i % 241}, 500);  //{i + 1:02d}")
+    return "\n".join(out)
+
+
+def legacy_parse(code: str):
+    """旧实现：每行 startswith / in 判断后再 re.search"""
+    result = []
+    for line in code.split('\n'):
+        if line.strip().startswith("HAL_Delay"):
+            match = re.search(r"\((\d+)\)", line)
+            if match:
+                result.append(("delay", int(match.group(1))))
+        elif "Servo_Do" in line:
+            match = re.search(r"\((\d+),\s*(\d+),\s*(\d+)\)", line)
+            if match:
+                result.append(("do", int(match.group(1)), int(match.group(2)), int(match.group(3))))
+    return result
+
+
+def best_of(fn, arg, repeat: int = 5) -> float:
+    """与 timeit 一样在计时期间关闭 GC，取最好成绩"""
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(arg)
+            best = min(best, time.perf_counter() - t0)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    text = make_script(lines)
+    assert len(legacy_parse(text)) == len(parse_script(text).instructions)
+    legacy = best_of(legacy_parse, text)
+    fast = best_of(parse_script, text)
+    print(f"{lines} 行")
+    print(f"legacy       {legacy * 1e3:8.1f} ms  {lines / legacy / 1e3:8.1f} k行/s")
+    print(f"script_parser{fast * 1e3:8.1f} ms  {lines / fast / 1e3:8.1f} k行/s  ({legacy / fast:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+bench_suite.py
+热点路径基准测试集，结果以 JSON 输出（每秒操作数与单次耗时分位数），便于前后对比：
+    - ServoController.pack_do（缓存命中 / 未命中）与 _checksum
+    - SerialManager.write_bytes 写入 pty（直接写 / 后台写线程）
+    - DanceEditor 在开头 / 末尾插入并删除一行，以及 play_all_frames（100 ~ 100k 行脚本，Qt offscreen 平台）
+    - config_manager.load_config
+用法：python benchmarks/bench_suite.py [-o results.json] [--quick] [--sizes 100,1000] [--only pack_do,editor]
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from config_manager import load_config, save_config  # noqa: E402
+from serial_manager import SerialManager  # noqa: E402
+from servo_controller import ServoController  # noqa: E402
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+QUICK_SIZES = (100, 1_000, 10_000)
+MIN_BATCH_S = 0.002   # 自动校准：一批调用至少持续的时间
+
+
+class QuietLog:
+    """丢弃 SerialManager 的日志，避免污染 JSON 输出"""
+    def append(self, msg: str):
+        pass
+
+
+def percentile(sorted_values, q: float) -> float:
+    """最近秩分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+
+def measure(fn, repeat: int = 20, number: int = 0, setup=None) -> dict:
+    """
+    重复执行 repeat 批，每批调用 fn number 次（0 表示自动校准），统计单次耗时
+    setup 在每批开始前调用且不计时；计时期间关闭 GC
+    """
+    if number <= 0:
+        number = 1
+        while True:
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - t0 >= MIN_BATCH_S or number >= 1 << 20:
+                break
+            number *= 2
+
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            t0 = time.perf_counter_ns()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter_ns() - t0) / number)
+    finally:
+        gc.enable()
+    samples.sort()
+    total = sum(samples)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "ops_per_sec": repeat * 1e9 / total if total else 0.0,
+        "mean_us": total / repeat / 1e3,
+        "min_us": samples[0] / 1e3,
+        "p50_us": percentile(samples, 50) / 1e3,
+        "p90_us": percentile(samples, 90) / 1e3,
+        "p99_us": percentile(samples, 99) / 1e3,
+        "max_us": samples[-1] / 1e3,
+    }
+
+
+def make_script(lines: int) -> str:
+    """每 25 行插入一个 0ms 延时，播放时不真正等待"""
+    out = []
+    for i in range(lines):
+        if i % 25 == 24:
+            out.append("HAL_Delay(0);")
+        else:
+            out.append(f"Servo_Do({i % 24 + 1}, {i % 241}, 500);")
+    return "\n".join(out)
+
+
+class PtySink:
+    """打开 pty，后台线程持续读空主端，模拟不限速的串口接收方"""
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.received = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while self._running:
+            try:
+                data = os.read(self.master, 65536)
+            except OSError:
+                break
+            self.received += len(data)
+
+    def close(self):
+        self._running = False
+        os.close(self.slave)
+        os.close(self.master)
+
+
+# ---------------- 各项测试 ----------------
+def bench_pack_do(args):
+    ctrl = ServoController(None)
+    results = []
+    ctrl.pack_do(1, 120, 500)
+    results.append(("pack_do.hit", {}, measure(lambda: ctrl.pack_do(1, 120, 500), args.repeat)))
+
+    keys = [(sid, angle, 500) for sid in range(1, 25) for angle in range(241)]
+    state = {"i": 0}
+
+    def miss():
+        i = state["i"]
+        state["i"] = i + 1
+        ctrl.pack_do(*keys[i % len(keys)])
+    # 缓存容量小于键数量，循环访问时每次都未命中
+    ctrl.packet_cache_size = 64
+    results.append(("pack_do.miss", {"keys": len(keys)}, measure(miss, args.repeat)))
+
+    body = bytes([1, 7, 1, 0xA0, 0x01, 0xF4, 0x01])
+    results.append(("checksum", {"bytes": len(body)}, measure(lambda: ctrl._checksum(body), args.repeat)))
+    return results
+
+
+def bench_write_bytes(args):
+    results = []
+    packet = ServoController(None).pack_do(1, 120, 500)
+    for mode in ("direct", "writer"):
+        sink = PtySink()
+        serial_mgr = SerialManager(logger=QuietLog())
+        serial_mgr.open(sink.port)
+        if mode == "writer":
+            serial_mgr.start_writer()
+        try:
+            stats = measure(lambda: serial_mgr.write_bytes(packet), args.repeat)
+            t0 = time.perf_counter()
+            serial_mgr.flush(timeout=5.0)
+            stats["flush_ms"] = (time.perf_counter() - t0) * 1e3
+            results.append((f"write_bytes.{mode}", {"bytes": len(packet)}, stats))
+        finally:
+            serial_mgr.stop_writer()
+            serial_mgr.close()
+            sink.close()
+    return results
+
+
+def bench_editor(args):
+    try:
+        from PySide6.QtWidgets import QApplication, QPlainTextEdit
+    except ImportError:
+        print("跳过编辑器测试：未安装 PySide6", file=sys.stderr)
+        return []
+    from dance_editor import DanceEditor
+    from dance_document import parse_records
+
+    app = QApplication.instance() or QApplication([])
+    sink = PtySink()
+    serial_mgr = SerialManager(logger=QuietLog())
+    serial_mgr.open(sink.port)
+    servo_ctrl = ServoController(serial_mgr)
+    results = []
+    try:
+        for size in args.sizes:
+            repeat = max(3, min(args.repeat, 200_000 // size))
+            textedit = QPlainTextEdit()
+            editor = DanceEditor(textedit)
+            editor.document.replace_all(parse_records(make_script(size)))
+            editor.flush_view()
+            app.processEvents()
+
+            params = {"lines": size}
+
+            def edit(line):
+                editor.insert_move(line, 1, 120, 500)
+                editor.flush_view()
+                editor.delete_line(line)
+                editor.flush_view()
+            results.append(("edit.head", params, measure(lambda: edit(0), repeat, number=1)))
+            results.append(("edit.tail", params, measure(lambda: edit(size - 10), repeat, number=1)))
+
+            def cold():
+                editor._program = None
+            results.append(("compile_program", params,
+                            measure(lambda: editor.compile_program(servo_ctrl), repeat, number=1, setup=cold)))
+            stats = measure(lambda: editor.play_all_frames(servo_ctrl), repeat, number=1)
+            stats["lines_per_sec"] = size * stats["ops_per_sec"]
+            results.append(("play_all_frames", params, stats))
+            textedit.deleteLater()
+            app.processEvents()
+        serial_mgr.flush(timeout=5.0)
+    finally:
+        serial_mgr.close()
+        sink.close()
+    return results
+
+
+def bench_load_config(args):
+    servos = {str(i): 90 + i for i in range(1, 25)}
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        save_config(path, "Bench", servos)
+        return [("load_config", {}, measure(lambda: load_config(path), args.repeat))]
+    finally:
+        os.remove(path)
+
+
+BENCHES = {
+    "pack_do": bench_pack_do,
+    "write_bytes": bench_write_bytes,
+    "editor": bench_editor,
+    "load_config": bench_load_config,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="舵机上位机热点路径基准测试")
+    parser.add_argument("-o", "--output", help="JSON 结果文件，默认输出到标准输出")
+    parser.add_argument("--quick", action="store_true", help="缩小脚本规模与重复次数")
+    parser.add_argument("--sizes", help="脚本行数列表，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=0, help="每项测试的重复批数")
+    parser.add_argument("--only", help="只运行指定测试，逗号分隔：" + ",".join(BENCHES))
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        args.sizes = [int(s) for s in args.sizes.split(",")]
+    else:
+        args.sizes = list(QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    if args.repeat <= 0:
+        args.repeat = 10 if args.quick else 30
+    names = args.only.split(",") if args.only else list(BENCHES)
+
+    results = []
+    for name in names:
+        bench = BENCHES.get(name)
+        if bench is None:
+            parser.error(f"未知测试: {name}")
+        for case, params, stats in bench(args):
+            results.append({"name": case, "params": params, **stats})
+            label = case + "".join(f" {k}={v}" for k, v in params.items())
+            print(f"{label:40s} {stats['ops_per_sec']:14.1f} ops/s  p50 {stats['p50_us']:10.2f}us  "
+                  f"p99 {stats['p99_us']:10.2f}us", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
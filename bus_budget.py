@@ -0,0 +1,173 @@
+"""
+bus_budget.py
+总线带宽预算分析（不依赖 Qt）：按波特率计算每条指令在线路上的传输时间，
+统计每个时间窗口的总线占用率，并模拟串口发送队列，找出会排队、迟到的指令。
+115200 波特下一个 10 字节 DO 包约占 0.87ms，24 条 Servo_Do 之间只隔 10ms 延时就会超载。
+"""
+from array import array
+from typing import NamedTuple, List
+from script_parser import parse_script, Delay
+from servo_controller import DO_PACKET_SIZE, SERVO_COUNT
+from dance_program import OP_SEND
+
+BITS_PER_BYTE = 10        # 8N1：起始位 + 8 数据位 + 停止位
+DEFAULT_WINDOW_MS = 50    # 占用率统计窗口
+SATURATED = 0.95          # 占用率达到该值的窗口视为总线饱和
+LATE_TOLERANCE_MS = 1.0   # 排队等待超过该值视为迟到
+
+
+class Burst(NamedTuple):
+    """在时间轴 at_ms 时刻需要写出的 nbytes 字节，line 为来源行号（动作组为帧号）"""
+    line: int
+    at_ms: int
+    nbytes: int
+
+
+class LateCommand(NamedTuple):
+    line: int
+    scheduled_ms: float   # 计划发送时刻
+    start_ms: float       # 所在组实际开始上线的时刻（更早的数据发完之后）
+    late_ms: float        # 被更早数据堵住的等待时间
+
+
+class BudgetReport(NamedTuple):
+    baudrate: int
+    window_ms: int
+    duration_ms: float      # 最后一个字节发完的时刻
+    total_bytes: int
+    wire_ms: float          # 全部数据的线路传输时间
+    occupancy: array        # 每个窗口内线路实际忙碌的时间比例（0~1）
+    late: List[LateCommand]
+    max_late_ms: float
+
+    @property
+    def peak_occupancy(self) -> float:
+        return max(self.occupancy) if self.occupancy else 0.0
+
+    @property
+    def saturated_windows(self) -> List[int]:
+        """总线接近满载的窗口序号"""
+        return [i for i, v in enumerate(self.occupancy) if v >= SATURATED]
+
+    @property
+    def ok(self) -> bool:
+        return not self.late
+
+    def format(self, limit: int = 20) -> str:
+        """生成文字报告，迟到指令最多列出 limit 条"""
+        lines = [
+            f"波特率 {self.baudrate}：共 {self.total_bytes} 字节，线路时间 {self.wire_ms:.1f}ms，"
+            f"播放时长 {self.duration_ms:.1f}ms",
+            f"占用率峰值 {self.peak_occupancy * 100:.0f}%（{self.window_ms}ms 窗口），"
+            f"饱和窗口 {len(self.saturated_windows)} 个",
+        ]
+        for index in self.saturated_windows[:limit]:
+            start = index * self.window_ms
+            lines.append(f"  {start}~{start + self.window_ms}ms：{self.occupancy[index] * 100:.0f}%")
+        if not self.late:
+            lines.append("没有排队迟到的指令。")
+            return "\n".join(lines)
+        lines.append(f"迟到指令 {len(self.late)} 条，最大迟到 {self.max_late_ms:.2f}ms：")
+        for cmd in self.late[:limit]:
+            lines.append(f"  第 {cmd.line} 行：计划 {cmd.scheduled_ms:.1f}ms，"
+                         f"实际 {cmd.start_ms:.1f}ms，迟到 {cmd.late_ms:.2f}ms")
+        if len(self.late) > limit:
+            lines.append(f"  ……另有 {len(self.late) - limit} 条")
+        return "\n".join(lines)
+
+
+def bursts_from_script(text: str) -> List[Burst]:
+    """脚本中每条 Servo_Do 是一个 10 字节包，HAL_Delay 推进时间轴"""
+    bursts = []
+    offset = 0
+    for ins in parse_script(text).instructions:
+        if isinstance(ins, Delay):
+            offset += ins.delay_ms
+        else:
+            bursts.append(Burst(ins.line, offset, DO_PACKET_SIZE))
+    return bursts
+
+
+def bursts_from_action_group(group) -> List[Burst]:
+    """动作组每帧一次写出 24 个 DO 包，随后等待该帧最长的运行时间"""
+    bursts = []
+    offset = 0
+    nbytes = SERVO_COUNT * DO_PACKET_SIZE
+    for index, frame in enumerate(group, 1):
+        bursts.append(Burst(index, offset, nbytes))
+        offset += max(frame.times)
+    return bursts
+
+
+def bursts_from_program(program) -> List[Burst]:
+    """
+    编译后的程序（DanceProgram / ChoreoFile 等），行号为播放步骤序号
+    遍历时累加延时得到时间轴（DanceProgram.offset_ms 每次都从头求和，逐步调用是平方复杂度）
+    """
+    bursts = []
+    offset = 0
+    for i in range(len(program)):
+        op, payload = program.step(i)
+        if op == OP_SEND:
+            bursts.append(Burst(i + 1, offset, len(payload)))
+        else:
+            offset += payload
+    return bursts
+
+
+def analyze(bursts, baudrate: int = 115200, window_ms: int = DEFAULT_WINDOW_MS,
+            tolerance_ms: float = LATE_TOLERANCE_MS) -> BudgetReport:
+    """
+    按时间顺序模拟单线串口：每批数据在计划时刻入队，前面的数据发完后才能开始传输。
+    同一时刻连续下发的指令本来就要依次上线，不算迟到；只有被更早时刻的数据
+    堵住、导致整组晚于计划开始时，组内各条指令才记为迟到
+    """
+    byte_ms = BITS_PER_BYTE * 1000 / baudrate
+    busy = []        # 各段实际传输区间 (开始, 结束)
+    late = []
+    bus_free = 0.0
+    total_bytes = 0
+    max_late = 0.0
+    group_at = None
+    wait = 0.0
+
+    for line, at, nbytes in bursts:
+        total_bytes += nbytes
+        if at != group_at:
+            group_at = at
+            wait = bus_free - at if bus_free > at else 0.0
+            if wait > max_late:
+                max_late = wait
+            start = at + wait
+            if busy and busy[-1][1] >= start:
+                start = busy.pop()[0]
+            busy.append([start, start])
+        if wait > tolerance_ms:
+            late.append(LateCommand(line, float(at), at + wait, wait))
+        bus_free = (bus_free if bus_free > at else float(at)) + nbytes * byte_ms
+        busy[-1][1] = bus_free
+
+    occupancy = array("f", bytes(4 * (int(bus_free // window_ms) + 1)))
+    for start, end in busy:
+        # 把传输区间按窗口切分累加
+        index = int(start // window_ms)
+        while start < end:
+            edge = (index + 1) * window_ms
+            stop = end if end < edge else edge
+            occupancy[index] += stop - start
+            start = stop
+            index += 1
+    for i in range(len(occupancy)):
+        occupancy[i] /= window_ms
+    return BudgetReport(baudrate, window_ms, bus_free, total_bytes, total_bytes * byte_ms,
+                        occupancy, late, max_late)
+
+
+def analyze_script(text: str, baudrate: int = 115200, window_ms: int = DEFAULT_WINDOW_MS,
+                   tolerance_ms: float = LATE_TOLERANCE_MS) -> BudgetReport:
+    return analyze(bursts_from_script(text), baudrate, window_ms, tolerance_ms)
+
+
+def analyze_action_group(group, baudrate: int = 115200, window_ms: int = DEFAULT_WINDOW_MS,
+                         tolerance_ms: float = LATE_TOLERANCE_MS) -> BudgetReport:
+    return analyze(bursts_from_action_group(group), baudrate, window_ms, tolerance_ms)
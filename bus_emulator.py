@@ -0,0 +1,301 @@
+"""
+bus_emulator.py
+串口舵机总线模拟器：打开一对 Linux 伪终端（pty），把从端当作串口交给 SerialManager，
+在主端解析 ServoController 发出的 0x55 0x55 指令包：
+    - DO 指令：舵机在 time_ms 内从当前位置匀速运动到目标位置
+    - 读位置 / 电压 / 温度：按波特率计算的字节时间延后应答
+    - 主机端串口的波特率与模拟总线不一致时丢弃收到的数据（与真实总线一样收不到应答）
+不需要真实的 USB 转串口适配器和舵机，可用于播放吞吐与延迟测试
+    python bus_emulator.py --baud 115200
+"""
+import argparse
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from typing import Optional
+from servo_controller import (
+    FrameParser, checksum, HEADER, SERVO_COUNT,
+    CMD_POS_READ, CMD_VIN_READ, CMD_TEMP_READ,
+)
+
+CMD_DO = 1
+CMD_CHANGE_ID = 13
+BROADCAST_ID = 0xFE
+BITS_PER_BYTE = 10      # 8N1：起始位 + 8 数据位 + 停止位
+REPLY_DELAY = 0.0005    # 舵机收到读指令到开始应答的处理时间（秒）
+
+
+class EmulatedServo:
+    """单个舵机的运动模型：DO 指令后在 time_ms 内线性移动到目标位置"""
+
+    def __init__(self, servo_id: int, position: int = 500,
+                 millivolts: int = 7400, celsius: int = 32):
+        self.servo_id = servo_id
+        self.millivolts = millivolts
+        self.celsius = celsius
+        self._from = float(position)
+        self._to = float(position)
+        self._t0 = 0.0
+        self._duration = 0.0
+        self.command_count = 0
+
+    def command(self, position: int, time_ms: int, now: float):
+        """从 now 时刻的位置出发，time_ms 内运动到 position"""
+        self._from = self.position_at(now)
+        self._to = float(position)
+        self._t0 = now
+        self._duration = time_ms / 1000
+        self.command_count += 1
+
+    def position_at(self, now: float) -> float:
+        elapsed = now - self._t0
+        if self._duration <= 0 or elapsed >= self._duration:
+            return self._to
+        if elapsed <= 0:
+            return self._from
+        return self._from + (self._to - self._from) * elapsed / self._duration
+
+    @property
+    def target(self) -> int:
+        return int(self._to)
+
+    def moving(self, now: float) -> bool:
+        return now - self._t0 < self._duration
+
+
+def pack_reply(servo_id: int, cmd: int, params: bytes) -> bytes:
+    """组装应答帧：55 55 ID LEN CMD params CHK"""
+    body = bytes((servo_id, len(params) + 3, cmd)) + params
+    return HEADER + body + bytes((checksum(body),))
+
+
+class BusEmulator:
+    """
+    伪终端舵机总线
+    port 属性为从端设备路径（如 /dev/pts/3），可直接传给 SerialManager.open()
+    总线按波特率串行占用：每个字节耗时 10 / baudrate 秒，指令在最后一个字节“到达”后生效
+    """
+
+    def __init__(self, servo_ids=None, baudrate: int = 115200, echo: bool = False,
+                 reply_delay: float = REPLY_DELAY, check_baud: bool = True):
+        """
+        :param servo_ids: 模拟的舵机 ID，默认 1~24
+        :param baudrate: 用于计算字节时间的波特率
+        :param echo: 是否模拟单线半双工适配器的请求回显
+        :param reply_delay: 读指令的应答处理时间（秒）
+        :param check_baud: 是否要求主机端串口设置为相同的波特率
+        """
+        ids = servo_ids if servo_ids is not None else range(1, SERVO_COUNT + 1)
+        self.servos = {sid: EmulatedServo(sid) for sid in ids}
+        self.baudrate = baudrate
+        self.byte_time = BITS_PER_BYTE / baudrate
+        self.echo = echo
+        self.reply_delay = reply_delay
+        self.check_baud = check_baud
+        self._speed = getattr(termios, f"B{baudrate}", None)
+        self.parser = FrameParser()
+
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self.port: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._bus_free_at = 0.0   # 总线空闲的时刻（perf_counter）
+
+        # 统计
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.frames_received = 0
+        self.replies_sent = 0
+        self.unknown_frames = 0
+        self.mismatched_bytes = 0
+        self.busy_time = 0.0
+
+    def start(self) -> str:
+        """打开 pty 并启动后台线程，返回串口设备路径"""
+        if self._running:
+            return self.port
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="BusEmulator", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def servo(self, servo_id: int) -> EmulatedServo:
+        return self.servos[servo_id]
+
+    def position(self, servo_id: int) -> float:
+        """舵机当前位置（0~1000）"""
+        return self.servos[servo_id].position_at(time.perf_counter())
+
+    def _baud_matches(self) -> bool:
+        """主机端通过 pyserial 设置的波特率是否与模拟总线一致"""
+        if not self.check_baud or self._speed is None:
+            return True
+        try:
+            return termios.tcgetattr(self._slave)[5] == self._speed
+        except termios.error:
+            return True
+
+    def _occupy(self, nbytes: int, now: float) -> float:
+        """nbytes 个字节占用总线，返回传输完成的时刻"""
+        start = max(now, self._bus_free_at)
+        duration = nbytes * self.byte_time
+        self._bus_free_at = start + duration
+        self.busy_time += duration
+        return self._bus_free_at
+
+    def _run(self):
+        master = self._master
+        while self._running:
+            try:
+                ready, _, _ = select.select([master], [], [], 0.05)
+            except (OSError, ValueError):
+                break
+            if not ready:
+                continue
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                break
+            if not data:
+                continue
+            if not self._baud_matches():
+                # 波特率不一致时舵机只会收到乱码
+                self.mismatched_bytes += len(data)
+                continue
+            now = time.perf_counter()
+            with self._lock:
+                self.bytes_received += len(data)
+                if self.echo:
+                    self._write(data)
+                replies = []
+                for frame in self.parser.iter_frames(data):
+                    done = self._occupy(len(frame), now)
+                    reply = self._handle(frame[2], frame[4], bytes(frame[5:-1]), done)
+                    if reply is not None:
+                        replies.append(reply)
+            for reply in replies:
+                self._send_reply(reply)
+
+    def _handle(self, servo_id: int, cmd: int, params: bytes, at: float) -> Optional[bytes]:
+        """处理一帧指令；读指令返回应答帧，其余返回 None"""
+        self.frames_received += 1
+        if servo_id == BROADCAST_ID:
+            targets = list(self.servos.values())
+        else:
+            servo = self.servos.get(servo_id)
+            targets = [servo] if servo is not None else []
+
+        if cmd == CMD_DO and len(params) == 4:
+            position = params[0] | params[1] << 8
+            time_ms = params[2] | params[3] << 8
+            for servo in targets:
+                servo.command(position, time_ms, at)
+            return None
+        if cmd == CMD_CHANGE_ID and len(params) == 1:
+            # 广播改 ID 只对总线上只有一个舵机时有意义
+            if len(self.servos) == 1:
+                (servo,) = self.servos.values()
+                servo.servo_id = params[0]
+                self.servos = {servo.servo_id: servo}
+            return None
+        if len(targets) != 1 or servo_id == BROADCAST_ID:
+            # 读指令只有对应 ID 的舵机应答；不存在的舵机保持沉默
+            if cmd not in (CMD_POS_READ, CMD_VIN_READ, CMD_TEMP_READ):
+                self.unknown_frames += 1
+            return None
+
+        servo = targets[0]
+        if cmd == CMD_POS_READ:
+            pos = int(round(servo.position_at(at)))
+            return pack_reply(servo.servo_id, cmd, pos.to_bytes(2, "little", signed=True))
+        if cmd == CMD_VIN_READ:
+            return pack_reply(servo.servo_id, cmd, servo.millivolts.to_bytes(2, "little"))
+        if cmd == CMD_TEMP_READ:
+            return pack_reply(servo.servo_id, cmd, bytes((servo.celsius & 0xFF,)))
+        self.unknown_frames += 1
+        return None
+
+    def _send_reply(self, reply: bytes):
+        """等到应答最后一个字节在真实总线上到达的时刻再写出"""
+        with self._lock:
+            done = self._occupy(len(reply), self._bus_free_at + self.reply_delay)
+        delay = done - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self._write(reply)
+            self.replies_sent += 1
+
+    def _write(self, data: bytes):
+        try:
+            os.write(self._master, data)
+            self.bytes_sent += len(data)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """收发统计，bus_busy_s 为按波特率累计的总线占用时间（秒）"""
+        return {
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+            "frames_received": self.frames_received,
+            "replies_sent": self.replies_sent,
+            "bad_frames": self.parser.bad_frames,
+            "unknown_frames": self.unknown_frames,
+            "mismatched_bytes": self.mismatched_bytes,
+            "bus_busy_s": self.busy_time,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="伪终端舵机总线模拟器")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--servos", type=int, default=SERVO_COUNT, help="模拟的舵机数量（ID 从 1 开始）")
+    parser.add_argument("--echo", action="store_true", help="模拟半双工适配器的请求回显")
+    args = parser.parse_args(argv)
+
+    emulator = BusEmulator(range(1, args.servos + 1), args.baud, args.echo)
+    port = emulator.start()
+    print(f"模拟总线已启动: {port} ({args.baud})，Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        print(emulator.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+"""
+choreo_file.py
+二进制编舞文件（.svc）：16 字节文件头 + 定长记录，带版本号
+文件通过 mmap 打开，播放时直接引用映射内存中预组好的指令包，无需解析，
+打开耗时与文件大小无关。提供与现有文本格式（Servo_Do/HAL_Delay 脚本、ActionGroup 行）的互转
+
+文件头 <4sBBHII：魔数 b"SVCH"、版本、类型、记录长度、记录数、总时长(ms)
+版本 2 起文件头后紧跟 <II：播放步数、DO 记录数
+类型 KIND_SCRIPT 记录 <BB10sII（20 字节）：
+    op(1=DO, 2=DELAY)、角度、DO 指令包、该记录在时间轴上的起始时刻(ms)、延时(ms)
+    版本 2 在记录之后附步骤表：步数 + 1 个小端 uint32，为每一步的首条记录下标（末项为记录数），
+    连续的 DO 记录归为一步
+类型 KIND_FRAMES 记录：48 个小端 uint16（24 路角度 + 24 路时间，96 字节）
+"""
+import mmap
+import struct
+import sys
+from array import array
+from action_group import ActionGroup, FRAME_WIDTH
+from dance_program import OP_SEND, OP_DELAY
+from script_parser import parse_script, Delay, ServoDo, format_instruction
+
+MAGIC = b"SVCH"
+VERSION = 2
+KIND_SCRIPT = 1
+KIND_FRAMES = 2
+
+HEADER = struct.Struct("<4sBBHII")
+STEP_HEADER = struct.Struct("<II")   # 版本 2：播放步数、DO 记录数
+SCRIPT_RECORD = struct.Struct("<BB10sII")
+FRAME_RECORD_SIZE = FRAME_WIDTH * 2
+
+REC_DO = 1
+REC_DELAY = 2
+_EMPTY_PACKET = bytes(10)
+
+
+def _write(path: str, kind: int, record_size: int, count: int, total_ms: int, body,
+           steps=None, move_count: int = 0):
+    """steps 为步骤表（含末项），仅脚本类型写入"""
+    step_count = len(steps) - 1 if steps else 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, kind, record_size, count, total_ms))
+        f.write(STEP_HEADER.pack(step_count, move_count))
+        f.write(body)
+        if steps:
+            if sys.byteorder != "little":
+                steps.byteswap()
+            f.write(steps.tobytes())
+
+
+def write_script(path: str, text: str, servo_ctrl):
+    """把 Servo_Do/HAL_Delay 文本脚本保存为二进制文件"""
+    body = bytearray()
+    steps = array("I")
+    at = 0
+    count = 0
+    moves = 0
+    prev_do = False
+    for ins in parse_script(text).instructions:
+        if isinstance(ins, Delay):
+            body += SCRIPT_RECORD.pack(REC_DELAY, 0, _EMPTY_PACKET, at, ins.delay_ms)
+            at += ins.delay_ms
+            steps.append(count)
+            prev_do = False
+        else:
+            packet = servo_ctrl.pack_do(ins.servo_id, ins.angle, ins.time_ms)
+            body += SCRIPT_RECORD.pack(REC_DO, ins.angle, packet, at, 0)
+            if not prev_do:
+                steps.append(count)
+            prev_do = True
+            moves += 1
+        count += 1
+    steps.append(count)
+    _write(path, KIND_SCRIPT, SCRIPT_RECORD.size, count, at, body, steps, moves)
+
+
+def write_frames(path: str, group: ActionGroup):
+    """把 ActionGroup 保存为二进制文件（整块写入）"""
+    total_ms = 0
+    for i in range(len(group)):
+        total_ms += max(group.row(i)[FRAME_WIDTH // 2:])
+    _write(path, KIND_FRAMES, FRAME_RECORD_SIZE, len(group), total_ms, group.to_bytes())
+
+
+class ChoreoFile:
+    """
+    mmap 方式打开的编舞文件；KIND_SCRIPT 类型可直接交给 PlaybackEngine 播放
+    （提供 __len__ / step / offset_ms 接口）。与 DanceProgram 一致，连续的 DO 记录合并为
+    一步整体写出，单条 DO 直接返回映射内存的 memoryview。
+    步骤表由写入端保存在文件中，打开时直接映射；版本 1 文件没有步骤表，第一次访问时扫描建立
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"文件为空: {path}")
+        self._view = memoryview(self._mmap)
+        self._steps = None   # 每一步的首条记录下标，末项为记录数
+        self._move_count = None
+        try:
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        if len(self._view) < HEADER.size:
+            raise ValueError("文件过短，不是有效的编舞文件")
+        magic, version, kind, record_size, count, total_ms = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            raise ValueError("文件格式错误：魔数不匹配")
+        if version > VERSION:
+            raise ValueError(f"不支持的文件版本: {version}")
+        expected = {KIND_SCRIPT: SCRIPT_RECORD.size, KIND_FRAMES: FRAME_RECORD_SIZE}.get(kind)
+        if expected is None or record_size != expected:
+            raise ValueError(f"不支持的记录类型: kind={kind} size={record_size}")
+        self._data = HEADER.size
+        step_count = 0
+        if version >= 2:
+            if len(self._view) < HEADER.size + STEP_HEADER.size:
+                raise ValueError("文件被截断")
+            step_count, self._move_count = STEP_HEADER.unpack_from(self._view, HEADER.size)
+            self._data += STEP_HEADER.size
+        end = self._data + count * record_size
+        if kind == KIND_SCRIPT and version >= 2:
+            table_end = end + (step_count + 1) * 4
+            if table_end > len(self._view):
+                raise ValueError("文件被截断")
+            self._steps = self._load_steps(self._view[end:table_end])
+            if self._steps[-1] != count:
+                raise ValueError("步骤表与记录数不一致")
+        elif end > len(self._view):
+            raise ValueError("文件被截断")
+        self.version = version
+        self.kind = kind
+        self.record_size = record_size
+        self.count = count
+        self.total_ms = total_ms
+
+    def close(self):
+        """
+        关闭文件；若 step()/row() 返回的切片仍被引用（播放线程、写队列），
+        映射内存留给垃圾回收在切片释放后再解除映射，不抛 BufferError
+        """
+        if self._mmap is None:
+            return
+        mm, self._mmap = self._mmap, None
+        self._file.close()
+        if isinstance(self._steps, memoryview):
+            self._steps.release()
+        try:
+            self._view.release()
+            mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """脚本类型为播放步数（连续 DO 合并为一步），帧类型为帧数"""
+        if self.kind != KIND_SCRIPT:
+            return self.count
+        return len(self._index_steps()) - 1
+
+    def _record(self, index: int) -> int:
+        if not 0 <= index < self.count:
+            raise IndexError("记录下标越界")
+        return self._data + index * self.record_size
+
+    def _records(self) -> memoryview:
+        return self._view[self._data:self._data + self.count * self.record_size]
+
+    @staticmethod
+    def _load_steps(raw: memoryview):
+        """步骤表：小端主机上直接映射，否则复制一份转换字节序"""
+        if sys.byteorder == "little":
+            return raw.cast("I")
+        steps = array("I", bytes(raw))
+        steps.byteswap()
+        return steps
+
+    # ---------------- 脚本类型：播放接口 ----------------
+    @property
+    def move_count(self) -> int:
+        if self._move_count is None:
+            ops = bytes(self._records()[::self.record_size])
+            self._move_count = ops.count(REC_DO)
+        return self._move_count
+
+    def _index_steps(self):
+        """返回步骤表；版本 1 文件没有步骤表，扫描各记录的 op 字节建立一次"""
+        if self._steps is None:
+            steps = array("I")
+            prev = None
+            for i, op in enumerate(bytes(self._records()[::self.record_size])):
+                if op != REC_DO or prev != REC_DO:
+                    steps.append(i)
+                prev = op
+            steps.append(self.count)
+            self._steps = steps
+        return self._steps
+
+    def step(self, index: int):
+        steps = self._index_steps()
+        if not 0 <= index < len(steps) - 1:
+            raise IndexError("步骤下标越界")
+        first = steps[index]
+        off = self._record(first)
+        view = self._view
+        if view[off] != REC_DO:
+            return OP_DELAY, struct.unpack_from("<I", view, off + 16)[0]
+        n = steps[index + 1] - first
+        if n == 1:
+            return OP_SEND, view[off + 2:off + 12]
+        size = self.record_size
+        return OP_SEND, b"".join([view[o + 2:o + 12] for o in range(off, off + n * size, size)])
+
+    def offset_ms(self, index: int) -> int:
+        steps = self._index_steps()
+        if index >= len(steps) - 1:
+            return self.total_ms
+        return struct.unpack_from("<I", self._view, self._record(steps[index]) + 12)[0]
+
+    def to_script(self) -> str:
+        """还原为 Servo_Do/HAL_Delay 文本"""
+        lines = []
+        for op, angle, packet, _, delay in SCRIPT_RECORD.iter_unpack(self._records()):
+            if op == REC_DO:
+                ins = ServoDo(0, packet[2], angle, packet[7] | packet[8] << 8)
+            else:
+                ins = Delay(0, delay)
+            lines.append(format_instruction(ins))
+        return "\n".join(lines)
+
+    # ---------------- 帧类型 ----------------
+    def row(self, index: int) -> memoryview:
+        """第 index 帧的 48 个 uint16（小端主机上零拷贝）"""
+        off = self._record(index)
+        raw = self._view[off:off + self.record_size]
+        if sys.byteorder == "little":
+            return raw.cast("H")
+        return memoryview(struct.pack(f"{FRAME_WIDTH}H", *struct.unpack(f"<{FRAME_WIDTH}H", raw))).cast("H")
+
+    def to_action_group(self) -> ActionGroup:
+        group = ActionGroup()
+        group.from_bytes(self._records())
+        return group
@@ -0,0 +1,43 @@
+"""
+command_coalescer.py
+滑条等高频输入的舵机指令合并器：每个舵机只保留最新目标，
+按固定频率把所有待发目标合并为一帧发送（不依赖 Qt，由调用方定时调用 flush）
+"""
+
+DEFAULT_RATE_HZ = 50
+
+
+class CommandCoalescer:
+    def __init__(self, servo_ctrl, rate_hz: float = DEFAULT_RATE_HZ):
+        self.servo_ctrl = servo_ctrl
+        self.rate_hz = DEFAULT_RATE_HZ
+        self._pending = {}  # servo_id -> (angle, time_ms)
+        self.set_rate(rate_hz)
+
+    @property
+    def interval_ms(self) -> int:
+        """两次发送之间的间隔（毫秒）"""
+        return max(1, int(round(1000 / self.rate_hz)))
+
+    def set_rate(self, rate_hz: float):
+        if rate_hz > 0:
+            self.rate_hz = rate_hz
+
+    def submit(self, servo_id: int, angle_deg: int, time_ms: int):
+        """登记目标，覆盖该舵机尚未发送的旧目标"""
+        self._pending[servo_id] = (angle_deg, time_ms)
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def discard(self):
+        """丢弃所有未发送的目标"""
+        self._pending.clear()
+
+    def flush(self) -> bool:
+        """把每个舵机的最新目标合并为一帧发送"""
+        if not self._pending:
+            return True
+        poses = [(sid, angle, t) for sid, (angle, t) in self._pending.items()]
+        self._pending.clear()
+        return self.servo_ctrl.send_frame(poses)
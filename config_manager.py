@@ -2,26 +2,61 @@
 config_manager.py
 读取 / 保存 config.json
 支持 validate 与默认生成。
+串口参数保存在 "serial" 字段：baudrate 为整数或 "auto"（连接时自动探测），
+write_timeout 为写超时秒数（null 表示一直阻塞）；旧配置文件缺少该字段时使用默认值。
 """
 import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 DEFAULT_DESCRIPTION = "Initial servo angles for the robot."
 DEFAULT_VERSION = "1.0"
+DEFAULT_BAUDRATE = 115200
+DEFAULT_WRITE_TIMEOUT = 1.0
+BAUDRATE_AUTO = "auto"
 
 
-def default_config(name: str, servos: Dict[str, int]) -> Dict[str, Any]:
+def default_serial_settings() -> Dict[str, Any]:
+    return {"baudrate": DEFAULT_BAUDRATE, "write_timeout": DEFAULT_WRITE_TIMEOUT}
+
+
+def default_config(name: str, servos: Dict[str, int], serial: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     return {
         "name": name or "DanceRobot",
         "description": DEFAULT_DESCRIPTION,
         "version": DEFAULT_VERSION,
         "created": datetime.now().strftime("%Y-%m-%d"),
-        "servos": servos
+        "servos": servos,
+        "serial": normalize_serial_settings(serial or {})
     }
 
 
+def normalize_serial_settings(serial: Dict[str, Any]) -> Dict[str, Any]:
+    """补全缺省值并检查串口参数，格式不对时抛出 ValueError"""
+    settings = default_serial_settings()
+    settings.update(serial)
+    baudrate = settings["baudrate"]
+    if baudrate != BAUDRATE_AUTO:
+        try:
+            baudrate = int(baudrate)
+        except (TypeError, ValueError):
+            raise ValueError(f"波特率无效: {baudrate!r}")
+        if baudrate <= 0:
+            raise ValueError(f"波特率无效: {baudrate}")
+    write_timeout = settings["write_timeout"]
+    if write_timeout is not None:
+        try:
+            write_timeout = float(write_timeout)
+        except (TypeError, ValueError):
+            raise ValueError(f"写超时无效: {write_timeout!r}")
+        if write_timeout < 0:
+            raise ValueError(f"写超时无效: {write_timeout}")
+    settings["baudrate"] = baudrate
+    settings["write_timeout"] = write_timeout
+    return settings
+
+
 def validate_config(data: Dict[str, Any]) -> bool:
     if "servos" not in data:
         return False
@@ -47,11 +82,16 @@ def load_config(path: str) -> Dict[str, Any]:
         raise ValueError("配置文件格式不符合要求（需要 servos 字段，且包含 1..24）")
     # normalize servo values to ints
     data["servos"] = {str(k): int(v) for k, v in data["servos"].items()}
+    serial = data.get("serial", {})
+    if not isinstance(serial, dict):
+        raise ValueError("配置文件格式不符合要求（serial 字段必须是对象）")
+    data["serial"] = normalize_serial_settings(serial)
     return data
 
 
-def save_config(path: str, name: str, servos: Dict[str, int], description: str = DEFAULT_DESCRIPTION, version: str = DEFAULT_VERSION):
-    cfg = default_config(name, servos)
+def save_config(path: str, name: str, servos: Dict[str, int], description: str = DEFAULT_DESCRIPTION, version: str = DEFAULT_VERSION,
+                serial: Optional[Dict[str, Any]] = None):
+    cfg = default_config(name, servos, serial)
     cfg["description"] = description
     cfg["version"] = version
     with open(path, "w", encoding="utf-8") as f:
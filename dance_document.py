@@ -0,0 +1,146 @@
+"""
+dance_document.py
+动作脚本的内存文档模型（不依赖 Qt）：记录列表 + 撤销/重做
+编辑器的文本框只是它的视图；播放直接读取模型，不再解析文本
+
+记录为紧凑元组：
+    (REC_DO, servo_id, angle, time_ms)
+    (REC_DELAY, delay_ms)
+    (REC_TEXT, text)   无法识别的行、空行与注释，原样保留
+"""
+import re
+from script_parser import parse_script, ServoDo, Delay, ParseError, MAX_TOTAL_MS
+
+REC_TEXT = 0
+REC_DO = 1
+REC_DELAY = 2
+
+_RE_INDEX = re.compile(r'//\d+$')
+UNDO_LIMIT = 1000
+
+
+def format_record(record) -> str:
+    """记录转换为脚本文本（不含行号注释）"""
+    kind = record[0]
+    if kind == REC_DO:
+        return f"Servo_Do({record[1]}, {record[2]}, {record[3]});"
+    if kind == REC_DELAY:
+        return f"HAL_Delay({record[1]});"
+    return record[1]
+
+
+def parse_records(text: str) -> list:
+    """把脚本文本解析为记录列表，每行对应一条记录"""
+    lines = text.split('\n')
+    records = [None] * len(lines)
+    for ins in parse_script(text).instructions:
+        if isinstance(ins, ServoDo):
+            records[ins.line - 1] = (REC_DO, ins.servo_id, ins.angle, ins.time_ms)
+        else:
+            records[ins.line - 1] = (REC_DELAY, ins.delay_ms)
+    for i, record in enumerate(records):
+        if record is None:
+            records[i] = (REC_TEXT, _RE_INDEX.sub('', lines[i]).strip())
+    return records
+
+
+class DanceDocument:
+    def __init__(self):
+        self.records = []
+        self.revision = 0        # 每次修改递增，供编译缓存判断
+        self.listeners = []      # 回调 (index, removed, records)：records[index:index+removed] 被替换为 records
+        self._undo = []
+        self._redo = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def _splice(self, index: int, remove: int, new_records) -> list:
+        """用 new_records 替换 records[index:index+remove]，返回被替换掉的记录"""
+        removed = self.records[index:index + remove]
+        self.records[index:index + remove] = new_records
+        self.revision += 1
+        for listener in self.listeners:
+            listener(index, len(removed), new_records)
+        return removed
+
+    def _apply(self, index: int, remove: int, new_records):
+        """执行一次可撤销的修改"""
+        index = max(0, min(index, len(self.records)))
+        new_records = list(new_records)
+        removed = self._splice(index, remove, new_records)
+        self._undo.append((index, len(new_records), removed))
+        if len(self._undo) > UNDO_LIMIT:
+            del self._undo[0]
+        self._redo.clear()
+
+    def insert(self, index: int, record):
+        self._apply(index, 0, [record])
+
+    def append(self, record):
+        self._apply(len(self.records), 0, [record])
+
+    def extend(self, records):
+        self._apply(len(self.records), 0, records)
+
+    def delete(self, index: int):
+        self._apply(index, 1, [])
+
+    def clear(self):
+        if self.records:
+            self._apply(0, len(self.records), [])
+
+    def replace_all(self, records):
+        self._apply(0, len(self.records), records)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self) -> bool:
+        if not self._undo:
+            return False
+        index, count, removed = self._undo.pop()
+        inserted = self._splice(index, count, removed)
+        self._redo.append((index, len(removed), inserted))
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo:
+            return False
+        index, count, removed = self._redo.pop()
+        inserted = self._splice(index, count, removed)
+        self._undo.append((index, len(removed), inserted))
+        return True
+
+    def lines(self, start: int = 0) -> list:
+        """第 start 条起每条记录对应的脚本文本（不含行号）"""
+        return [format_record(r) for r in self.records[start:]]
+
+    def errors(self) -> list:
+        """越界或无法识别、播放时会被跳过的行（ParseError，line 为当前行号）"""
+        errors = []
+        for n, record in enumerate(self.records, 1):
+            if record[0] != REC_TEXT or not record[1]:
+                continue
+            result = parse_script(record[1])
+            if result.errors:
+                errors.extend(err._replace(line=n) for err in result.errors)
+            elif result.instructions:
+                # 单独一行合法，是因为累计时长超出上限被整篇解析拒绝
+                errors.append(ParseError(n, record[1], f"脚本总时长超出范围 (0~{MAX_TOTAL_MS}ms)"))
+        return errors
+
+    def instructions(self):
+        """产出 script_parser 的指令类型（line 为当前行号），供编译播放使用"""
+        for n, record in enumerate(self.records, 1):
+            kind = record[0]
+            if kind == REC_DO:
+                yield ServoDo(n, record[1], record[2], record[3])
+            elif kind == REC_DELAY:
+                yield Delay(n, record[1])
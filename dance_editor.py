@@ -1,114 +1,320 @@
-import re
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QApplication, QWidget
+from PySide6.QtCore import Qt, QTimer, QEvent, QObject
+from PySide6.QtGui import QTextCursor, QPainter, QKeySequence
+from dance_program import compile_instructions, OP_SEND
+from dance_document import DanceDocument, parse_records, format_record, REC_DO, REC_DELAY
+from scheduler import DeadlineScheduler
+
+ERROR_LOG_LIMIT = 20   # 播放前最多逐条列出的错误行数
+
+
+class LineNumberArea(QWidget):
+    """
+    QPlainTextEdit 左侧的行号栏：只绘制可见行的行号，行号不写进文本，
+    插入/删除行不需要改动后面的内容
+    """
+    PADDING = 6
+
+    def __init__(self, textedit):
+        super().__init__(textedit)
+        self.textedit = textedit
+        self.setFont(textedit.font())
+        textedit.blockCountChanged.connect(self.update_width)
+        textedit.updateRequest.connect(self._on_update_request)
+        textedit.installEventFilter(self)
+        self.update_width()
+
+    def area_width(self) -> int:
+        digits = max(2, len(str(self.textedit.blockCount())))
+        return self.fontMetrics().horizontalAdvance("9") * digits + self.PADDING * 2
+
+    def update_width(self, *args):
+        width = self.area_width()
+        if self.textedit.viewportMargins().left() != width:
+            self.textedit.setViewportMargins(width, 0, 0, 0)
+        rect = self.textedit.contentsRect()
+        self.setGeometry(rect.left(), rect.top(), width, rect.height())
+
+    def _on_update_request(self, rect, dy):
+        """文本框滚动或重绘时同步行号栏"""
+        if dy:
+            self.scroll(0, dy)
+        else:
+            self.update(0, rect.y(), self.width(), rect.height())
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize:
+            self.update_width()
+        return False
+
+    def paintEvent(self, event):
+        textedit = self.textedit
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.palette().window())
+        painter.setPen(self.palette().placeholderText().color())
+        line_height = self.fontMetrics().height()
+        bottom = event.rect().bottom()
+        # 从第一个可见块开始，画到区域底部为止
+        block = textedit.firstVisibleBlock()
+        top = textedit.blockBoundingGeometry(block).translated(textedit.contentOffset()).top()
+        while block.isValid() and top <= bottom:
+            if block.isVisible():
+                painter.drawText(0, int(top), self.width() - self.PADDING, line_height,
+                                 Qt.AlignRight, str(block.blockNumber() + 1))
+            top += textedit.blockBoundingRect(block).height()
+            block = block.next()
+
+
+class UndoKeyFilter(QObject):
+    """
+    文本框获得焦点时把撤销/重做按键（Ctrl+Z、Ctrl+Y / Ctrl+Shift+Z）交给 DanceEditor，
+    文本框自己的撤销栈已关闭，否则它会先把按键当作快捷键覆盖吃掉
+    """
+    def __init__(self, editor):
+        super().__init__(editor.textedit_output)
+        self.editor = editor
+
+    @staticmethod
+    def _action(event):
+        if event.matches(QKeySequence.Undo):
+            return "undo"
+        if event.matches(QKeySequence.Redo) or (
+                event.key() == Qt.Key_Y and event.modifiers() == Qt.ControlModifier):
+            return "redo"
+        return None
+
+    def eventFilter(self, obj, event):
+        kind = event.type()
+        if kind not in (QEvent.ShortcutOverride, QEvent.KeyPress):
+            return False
+        action = self._action(event)
+        if action is None:
+            return False
+        if kind == QEvent.KeyPress:
+            getattr(self.editor, action)()
+        event.accept()
+        return True
+
 
 class DanceEditor:
+    """
+    动作编辑器：DanceDocument 是唯一数据源，文本框只是视图
+    模型的每次修改记录为一次行替换，下一轮事件循环再依次应用到文本框，只改动受影响的行；
+    行号画在左侧行号栏中，只有导出（copy）时才带 //NN 行号注释。
+    用户直接在文本框中手动编辑时，下次操作前重新解析文本回写模型
+    """
     def __init__(self, textedit_output):
         # 接收主窗口的文本编辑框控件
         self.textedit_output = textedit_output
         self.line = 1  # 行号计数器
+        self.document = DanceDocument()
+        self.document.listeners.append(self._on_model_changed)
+        # 编译缓存：只有模型变化时才重新编译
+        self._program = None
+        self._program_revision = None
 
-    def add_index(self):
-        """添加/刷新行号注释"""
-        self.textedit_output.blockSignals(True)
+        self._pending = []         # 尚未应用到文本框的行替换 (index, removed, lines)
+        self._view_lines = 0       # 文本框当前对应的记录数
+        self._syncing = False      # 正在从文本框回写模型，不需要再改文本框
+        self._view_edited = False  # 用户手动改过文本框
+        self._sync_timer = QTimer()
+        self._sync_timer.setSingleShot(True)
+        self._sync_timer.setInterval(0)
+        self._sync_timer.timeout.connect(self.flush_view)
+        self.textedit_output.textChanged.connect(self._on_view_edited)
+        if self.textedit_output.toPlainText():
+            self._view_edited = True
+        self.number_area = LineNumberArea(self.textedit_output)
+        # 撤销/重做只走模型的撤销栈；文本框自己的撤销栈会记录 flush_view 的改动，与模型对不上
+        self.textedit_output.setUndoRedoEnabled(False)
+        self._key_filter = UndoKeyFilter(self)
+        self.textedit_output.installEventFilter(self._key_filter)
 
-        # 保存光标位置
-        cursor = self.textedit_output.textCursor()
-        pos = cursor.position()
+    # ---------------- 模型 <-> 视图同步 ----------------
+    def _on_model_changed(self, index, removed, records):
+        if self._syncing:
+            return
+        self._pending.append((index, removed, [format_record(r) for r in records]))
+        if not self._sync_timer.isActive():
+            self._sync_timer.start()
 
-        # 修改内容
+    def _on_view_edited(self):
+        self._view_edited = True
+
+    def _sync_model(self):
+        """文本框被手动编辑过时，重新解析文本写回模型（文本框本身保持不动）"""
+        self.flush_view()
+        if not self._view_edited:
+            return
+        self._view_edited = False
         code = self.textedit_output.toPlainText()
-        lineslist = code.split('\n')
+        records = parse_records(code) if code else []
+        self._view_lines = len(records)
+        if records != self.document.records:
+            self._syncing = True
+            try:
+                self.document.replace_all(records)
+            finally:
+                self._syncing = False
 
-        updated_lines = []
-        for i, line in enumerate(lineslist):
-            # 移除原有行号注释，重新添加
-            line = re.sub(r'//\d{2}$', '', line).strip()
-            updated_lines.append(f"{line}  //{i + 1:02d}")
+    def flush_view(self):
+        """把尚未同步的行替换依次应用到文本框，每次只改动被替换的行"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._sync_timer.stop()
+        doc = self.textedit_output.document()
+        self.textedit_output.blockSignals(True)
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        try:
+            for index, removed, lines in pending:
+                self._replace_lines(doc, cursor, index, removed, lines)
+        finally:
+            cursor.endEditBlock()
+            self.textedit_output.blockSignals(False)
+        # 写入期间屏蔽了 blockCountChanged，行数位数可能变化
+        self.number_area.update_width()
+        self.number_area.update()
 
-        # 更新文本内容
-        self.textedit_output.setPlainText('\n'.join(updated_lines))
+    def _replace_lines(self, doc, cursor, index, removed, lines):
+        """把文本框第 index 行起的 removed 行替换为 lines"""
+        count = self._view_lines
+        end = index + removed
+        if end < count:
+            # 后面还有行：连同被删行的换行符一起替换
+            cursor.setPosition(doc.findBlockByNumber(index).position())
+            cursor.setPosition(doc.findBlockByNumber(end).position(), QTextCursor.KeepAnchor)
+            text = ''.join(line + '\n' for line in lines)
+        elif index == 0:
+            cursor.select(QTextCursor.Document)
+            text = '\n'.join(lines)
+        else:
+            # 替换到末尾：从上一行行尾开始，连同换行符一起处理
+            block = doc.findBlockByNumber(index - 1)
+            cursor.setPosition(block.position() + block.length() - 1)
+            cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+            text = ''.join('\n' + line for line in lines)
+        cursor.insertText(text)
+        self._view_lines = count - removed + len(lines)
 
-        # 恢复光标位置（如果原位置超出新内容长度，就用末尾）
-        new_cursor = self.textedit_output.textCursor()
-        new_pos = min(pos, len(self.textedit_output.toPlainText()))
-        new_cursor.setPosition(new_pos)
-        self.textedit_output.setTextCursor(new_cursor)
+    def add_index(self, start_line: int = 0):
+        """刷新行号（行号栏只绘制可见行，start_line 仅为兼容保留）"""
+        self.flush_view()
+        self.number_area.update()
 
-        self.textedit_output.blockSignals(False)
+    def export_text(self) -> str:
+        """导出脚本文本，每行带 //NN 行号注释（与原先文本框中的格式一致）"""
+        self._sync_model()
+        return '\n'.join(f"{text}  //{n:02d}" for n, text in enumerate(self.document.lines(), 1))
 
+    def copy_content(self):
+        """复制带行号注释的脚本到剪切板"""
+        QApplication.clipboard().setText(self.export_text())
+
+    # ---------------- 编辑操作 ----------------
     def paste_content(self):
         """粘贴剪切板内容"""
         clipboard = QApplication.clipboard()
         text = clipboard.text()
-        self.textedit_output.append(text)
-        self.add_index()
+        self._sync_model()
+        if text:
+            self.document.extend(parse_records(text))
 
     def add_frame(self, servo_id, angle, time_val):
         """添加单个动作帧"""
-        self.textedit_output.append(f"Servo_Do({servo_id}, {angle}, {time_val});")
-        self.add_index()
+        self._sync_model()
+        self.document.append((REC_DO, servo_id, angle, time_val))
 
     def clear_all_frames(self):
         """清空所有帧"""
-        self.textedit_output.clear()
+        self._sync_model()
+        self.document.clear()
         self.line = 1
 
     def insert_move(self, insert_line, servo_id, angle, time_val):
         """插入动作帧"""
-        new_content = f"Servo_Do({servo_id}, {angle}, {time_val});"
-        code = self.textedit_output.toPlainText()
-        lineslist = code.split('\n')
+        self._sync_model()
+        line_count = max(len(self.document), 1)
 
-        if 0 <= insert_line <= len(lineslist):
-            lineslist.insert(insert_line, new_content)
-            self.textedit_output.setPlainText('\n'.join(lineslist))
-            self.add_index()
+        if 0 <= insert_line <= line_count:
+            self.document.insert(insert_line, (REC_DO, servo_id, angle, time_val))
             self.line += 1
 
     def insert_delay(self, insert_line, delay_val):
         """插入延时"""
-        new_content = f"HAL_Delay({delay_val});"
-        code = self.textedit_output.toPlainText()
-        lineslist = code.split('\n')
+        self._sync_model()
+        line_count = max(len(self.document), 1)
 
-        if 0 <= insert_line < len(lineslist):
-            lineslist.insert(insert_line, new_content)
-            self.textedit_output.setPlainText('\n'.join(lineslist))
-            self.add_index()
+        if 0 <= insert_line < line_count:
+            self.document.insert(insert_line, (REC_DELAY, delay_val))
             self.line += 1
 
     def add_delay(self, delay_val):
         """添加延时"""
-        self.textedit_output.append(f"HAL_Delay({delay_val});")
-        self.add_index()
+        self._sync_model()
+        self.document.append((REC_DELAY, delay_val))
 
     def delete_line(self, delete_line):
         """删除指定行"""
-        code = self.textedit_output.toPlainText()
-        lineslist = code.split('\n')
+        self._sync_model()
 
-        if 0 <= delete_line < len(lineslist):
-            lineslist.pop(delete_line)
-            self.textedit_output.setPlainText('\n'.join(lineslist))
-            self.add_index()
+        if 0 <= delete_line < len(self.document):
+            self.document.delete(delete_line)
             self.line = max(1, self.line - 1)  # 防止行号为负
 
+    def undo(self):
+        """撤销上一次修改；文本框中手动输入的内容在撤销前先作为一次修改写回模型"""
+        self._sync_model()
+        return self.document.undo()
+
+    def redo(self):
+        self._sync_model()
+        return self.document.redo()
+
+    # ---------------- 播放 ----------------
+    def compile_program(self, servo_ctrl):
+        """直接从模型编译；模型未变化时返回缓存的程序"""
+        self._sync_model()
+        if self._program is None or self._program_revision != self.document.revision:
+            self._program = compile_instructions(self.document.instructions(), servo_ctrl)
+            self._program_revision = self.document.revision
+        return self._program
+
+    def log_errors(self, serial_mgr, limit: int = ERROR_LOG_LIMIT) -> int:
+        """在日志中列出播放时会被跳过的行（越界或无法识别），返回错误行数"""
+        self._sync_model()
+        errors = self.document.errors()
+        for err in errors[:limit]:
+            serial_mgr.log(f"第 {err.line} 行未播放：{err.message}：{err.text}")
+        if len(errors) > limit:
+            serial_mgr.log(f"……另有 {len(errors) - limit} 行未播放")
+        return len(errors)
+
     def play_all_frames(self, servo_ctrl):
         """播放所有帧"""
-        code = self.textedit_output.toPlainText()
-        lineslist = code.split('\n')
-        for line in lineslist:
-            if line.strip().startswith("HAL_Delay"):
-                match = re.search(r"\((\d+)\)", line)
-                if match:
-                    delay = int(match.group(1))
-                    import time
-                    time.sleep(delay / 1000)
-            elif "Servo_Do" in line:
-                match = re.search(r"\((\d+),\s*(\d+),\s*(\d+)\)", line)
-                if match:
-                    servo_id = int(match.group(1))
-                    angle = int(match.group(2))
-                    time_val = int(match.group(3))
-                    servo_ctrl.send_do(servo_id, angle, time_val)
\ No newline at end of file
+        program = self.compile_program(servo_ctrl)
+        serial_mgr = servo_ctrl.serial_mgr
+        if not serial_mgr.is_open():
+            serial_mgr.log("串口未打开，无法发送舵机指令。")
+            return
+        self.log_errors(serial_mgr)
+        serial_mgr.log(f"开始播放：{program.move_count} 条动作，共 {program.total_ms}ms 延时")
+        # 按绝对截止时间延时，避免写串口耗时累积
+        scheduler = DeadlineScheduler()
+        scheduler.start()
+        recorder = servo_ctrl.recorder
+        offset = 0
+        for i in range(len(program)):
+            op, payload = program.step(i)
+            if op == OP_SEND:
+                scheduler.mark(offset)
+                if not serial_mgr.write_bytes(payload):
+                    return
+                if recorder is not None:
+                    recorder.record_packets(payload)
+            else:
+                offset += payload
+                scheduler.sleep_until(offset)
+        serial_mgr.log("播放完成。")
+        return scheduler.summary()
@@ -0,0 +1,90 @@
+"""
+dance_program.py
+将 Servo_Do(...) / HAL_Delay(...) 动作脚本编译为紧凑指令流
+播放时只遍历预先组好的字节包，不再做任何文本解析（不依赖 Qt）
+"""
+from array import array
+from script_parser import parse_script, Delay
+
+OP_SEND = 1   # 发送一段预组好的字节包（连续的 Servo_Do 合并为一次写入）
+OP_DELAY = 2  # 延时，参数为毫秒
+
+
+class DanceProgram:
+    """
+    编译后的动作程序
+    ops:     指令码数组
+    args:    OP_SEND 时为 packets 下标，OP_DELAY 时为延时毫秒
+    packets: 预组好的字节包
+    """
+    def __init__(self):
+        self.ops = array("B")
+        self.args = array("I")
+        self.packets = []
+        self.move_count = 0   # Servo_Do 条数
+        self.total_ms = 0     # 全部延时之和
+
+    def __len__(self):
+        return len(self.ops)
+
+    def step(self, index: int):
+        """返回第 index 条指令 (op, payload)；payload 为字节包或延时毫秒"""
+        op = self.ops[index]
+        arg = self.args[index]
+        if op == OP_SEND:
+            return op, self.packets[arg]
+        return op, arg
+
+    def offset_ms(self, index: int) -> int:
+        """第 index 条指令在时间轴上的起始时刻（之前所有延时之和）"""
+        ops, args = self.ops, self.args
+        return sum(args[i] for i in range(min(index, len(ops))) if ops[i] != OP_SEND)
+
+    def add_delay(self, delay_ms: int):
+        self.ops.append(OP_DELAY)
+        self.args.append(delay_ms)
+        self.total_ms += delay_ms
+
+    def add_packets(self, chunks):
+        """追加一段连续的 DO 包，合并为一条 OP_SEND"""
+        if not chunks:
+            return
+        self.ops.append(OP_SEND)
+        self.args.append(len(self.packets))
+        self.packets.append(b"".join(chunks))
+        self.move_count += len(chunks)
+
+
+def compile_instructions(instructions, servo_ctrl) -> DanceProgram:
+    """把 script_parser 产出的指令列表编译为 DanceProgram"""
+    program = DanceProgram()
+    pending = []
+    pack_do = servo_ctrl.pack_do
+    for ins in instructions:
+        if isinstance(ins, Delay):
+            program.add_packets(pending)
+            pending = []
+            program.add_delay(ins.delay_ms)
+        else:
+            pending.append(pack_do(ins.servo_id, ins.angle, ins.time_ms))
+    program.add_packets(pending)
+    return program
+
+
+def compile_script(text: str, servo_ctrl) -> DanceProgram:
+    """把编辑器文本编译为 DanceProgram，servo_ctrl 负责组包；无法识别的行被忽略"""
+    return compile_instructions(parse_script(text).instructions, servo_ctrl)
+
+
+def compile_frames(group, servo_ctrl, servo_ids=None) -> DanceProgram:
+    """
+    把 ActionGroup 编译为 DanceProgram：每帧 24 路指令合并发送，
+    随后等待该帧中最长的运行时间
+    """
+    program = DanceProgram()
+    servo_ids = list(servo_ids or range(1, 25))
+    for frame in group:
+        program.add_packets([servo_ctrl.pack_do(sid, angle, t)
+                             for sid, angle, t in zip(servo_ids, frame.angles, frame.times)])
+        program.add_delay(max(frame.times))
+    return program
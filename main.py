@@ -2,42 +2,37 @@
 main.py
 依赖 ui.wudao 和 ui.create
 """
-import time
-from PySide6.QtWidgets import QApplication, QWidget, QFileDialog, QMessageBox
-from PySide6.QtGui import QIntValidator
-from PySide6.QtCore import Qt,QTimer
+from PySide6.QtWidgets import QApplication, QWidget, QFileDialog, QMessageBox, QComboBox
+from PySide6.QtGui import QIntValidator, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QTimer, QObject, Signal
 from ui.wudao import Ui_Form
 from ui.create import Ui_Form2
 from serial_manager import SerialManager
-from servo_controller import ServoController
-from config_manager import load_config, save_config, default_config
+from serial_monitor import PortMonitor
+from servo_controller import ServoController, BAUD_RATES
+from config_manager import load_config, save_config, default_config, default_serial_settings, DEFAULT_BAUDRATE, BAUDRATE_AUTO
 from dance_editor import DanceEditor
-class ActionFrame:
-    def __init__(self, angles, times):
-        self.angles = angles  # list[int]
-        self.times = times    # list[int]
+from playback_engine import PlaybackEngine, STATE_PAUSED
+from command_coalescer import CommandCoalescer
+from action_group import ActionGroup, ActionFrame
+from script_parser import MAX_DELAY_MS
+from telemetry_log import TelemetryRecorder
 
-class ActionGroup:
-    def __init__(self):
-        self.frames = []
 
-    def add_frame(self, angles, times):
-        self.frames.append(ActionFrame(angles, times))
+class LogBridge(QObject):
+    """线程安全的日志转发：任意线程调用 append，由信号投递到界面线程"""
+    message = Signal(str)
+
+    def append(self, msg: str):
+        self.message.emit(msg)
+
 
-    def clear(self):
-        self.frames.clear()
+class PlaybackSignals(QObject):
+    """播放引擎回调 -> Qt 信号（跨线程自动排队到界面线程）"""
+    progress = Signal(int, int)
+    finished = Signal(bool)
 
-    def to_lines(self):
-        return [",".join(map(str, f.angles + f.times)) for f in self.frames]
 
-    def from_lines(self, lines):
-        self.frames = []
-        for line in lines:
-            values = list(map(int, line.strip().split(",")))
-            if len(values) == 48:
-                angles = values[:24]
-                times = values[24:]
-                self.frames.append(ActionFrame(angles, times))
 class MainWindow(QWidget, Ui_Form):
     def __init__(self):
         super().__init__()
@@ -49,17 +44,38 @@ class MainWindow(QWidget, Ui_Form):
             pass
 
         # 导入实例化
-        self.serial_mgr = SerialManager(logger=self.textEdit)
+        self.log_bridge = LogBridge(self)
+        self.log_bridge.message.connect(self.textEdit.append)
+        self.serial_mgr = SerialManager(logger=self.log_bridge)
+        # 串口热插拔检测由 Qt 适配层负责，SerialManager 本身不轮询
+        self.port_monitor = PortMonitor(self.serial_mgr, parent=self)
+        # 串口写入交给后台线程，界面线程只负责入队
+        self.serial_mgr.start_writer()
         self.servo_ctrl = ServoController(self.serial_mgr)
+        # 滑条指令合并：每个舵机只发最新角度，默认 50Hz
+        self.coalescer = CommandCoalescer(self.servo_ctrl)
+        self.coalesce_timer = QTimer(self)
+        self.coalesce_timer.setInterval(self.coalescer.interval_ms)
+        self.coalesce_timer.timeout.connect(self.flush_slider_commands)
         self.dance_editor = DanceEditor(self.textedit_output)
 
-        self.combo_sync_timer = QTimer(self)
-        # 同步间隔与 SerialManager 刷新间隔
-        self.combo_sync_timer.setInterval(1000)
-        # 绑定同步函数
-        self.combo_sync_timer.timeout.connect(self.sync_combo_ports)
-        # 启动定时器
-        self.combo_sync_timer.start()
+        # 播放引擎在工作线程中运行，进度通过信号回到界面线程
+        self.playback_signals = PlaybackSignals(self)
+        self.playback_signals.progress.connect(self.on_playback_progress)
+        self.playback_signals.finished.connect(self.on_playback_finished)
+        self.playback = PlaybackEngine(
+            self.serial_mgr,
+            on_progress=self.playback_signals.progress.emit,
+            on_finished=self.playback_signals.finished.emit,
+        )
+        self.play_button_text = self.pushButton_playGroup.text()
+        # 下发的目标角度（滑条、初始化、动作播放）记录到定长环形缓冲区，Ctrl+E 导出
+        self.telemetry = TelemetryRecorder()
+        self.servo_ctrl.recorder = self.telemetry
+        self.playback.recorder = self.telemetry
+
+        # 串口集合变化时（inotify 事件或轮询）同步下拉框
+        self.port_monitor.portsChanged.connect(self.sync_combo_ports)
         # 绑定 UI 命名规则
         self.servo_values = {
             i: {
@@ -76,13 +92,15 @@ class MainWindow(QWidget, Ui_Form):
             except Exception:
                 pass
 
+        self.serial_settings = default_serial_settings()  # 波特率与写超时，导入配置后更新
+        self.setup_baud_combo()
         self.bind_ui()
         self.setup_dance_editor()
         self.populate_serial_ports()
         self.config_data = None  # 当前加载的配置内容
 
-    def sync_combo_ports(self):
-        """自动同步串口下拉框"""
+    def sync_combo_ports(self, ports=None):
+        """自动同步串口下拉框（由 PortMonitor.portsChanged 触发）"""
         current_selected_text = self.comboBox_ports.currentText()
         # 获取 SerialManager 中最新的串口列表
         latest_ports = self.serial_mgr.ports_list
@@ -96,11 +114,17 @@ class MainWindow(QWidget, Ui_Form):
         latest_devices = set(p.device for p in latest_ports)
 
         if combo_devices != latest_devices:
-            self.populate_serial_ports()
-            if current_selected_text != "请选择你的串口...":
-                new_index = self.comboBox_ports.findText(current_selected_text)
-                if new_index != -1:
-                    self.comboBox_ports.setCurrentIndex(new_index)
+            # 重建列表并恢复选中项时屏蔽信号，避免 select_port 重新打开正在使用的串口
+            self.comboBox_ports.blockSignals(True)
+            try:
+                self.populate_serial_ports()
+                if current_selected_text != "请选择你的串口...":
+                    new_index = self.comboBox_ports.findText(current_selected_text)
+                    if new_index != -1:
+                        self.comboBox_ports.setCurrentIndex(new_index)
+            finally:
+                self.comboBox_ports.blockSignals(False)
+
     def bind_ui(self):
         # 角度与时间输入校验和响应
         for i in range(1, 25):
@@ -109,9 +133,10 @@ class MainWindow(QWidget, Ui_Form):
             sl = self.servo_values[i]["slider"]
             le.setValidator(QIntValidator(0, 240, self))
             lt.setValidator(QIntValidator(0, 200, self))
-            sl.valueChanged.connect(self.on_slider_changed)
-            le.editingFinished.connect(self.on_angle_edit_finished)
-            lt.editingFinished.connect(self.on_time_edit_finished)
+            # 连接时直接绑定舵机序号，无需在回调中扫描焦点
+            sl.valueChanged.connect(self._make_slider_cb(i))
+            le.editingFinished.connect(self._make_angle_cb(i))
+            lt.editingFinished.connect(self._make_time_cb(i))
 
 
         self.pushButton_init.clicked.connect(self.servo_init)
@@ -127,11 +152,23 @@ class MainWindow(QWidget, Ui_Form):
         self.pushButton_clearFrames.clicked.connect(self.on_clear_frames_clicked)
         self.pushButton_playGroup.clicked.connect(self.on_play_group_clicked)
         self.pushButton_delay.clicked.connect(self.pushButton_delay_clicked)
+        # 与脚本解析的延时上限一致，避免编译时 uint32 溢出
+        self.lineEdit_delay.setValidator(QIntValidator(0, MAX_DELAY_MS, self))
         self.pushButton_clearline.clicked.connect(self.pushButton_clearline_clicked)
         self.pushButton_insertmove.clicked.connect(self.pushButton_insertmove_clicked)
         self.pushButton_insertdelay.clicked.connect(self.pushButton_insertdelay_clicked)
         self.pushButton_paste.clicked.connect(self.pushButton_paste_clicked)
+        self.pushButton.clicked.connect(self.dance_editor.copy_content)  # copy：导出带行号注释的脚本
         self.pushButton_init_2.clicked.connect(self.servo_init)
+        # Esc 紧急停止，Ctrl+Space 暂停/继续
+        QShortcut(QKeySequence(Qt.Key_Escape), self, self.stop_playback)
+        QShortcut(QKeySequence("Ctrl+Space"), self, self.toggle_pause_playback)
+        QShortcut(QKeySequence("Ctrl+E"), self, self.export_telemetry)
+        # 动作编辑页的撤销/重做走 DanceDocument 的撤销栈（文本框获得焦点时由 UndoKeyFilter 处理）
+        for keys, slot in ((QKeySequence.Undo, self.dance_editor.undo),
+                           (QKeySequence.Redo, self.dance_editor.redo),
+                           (QKeySequence("Ctrl+Y"), self.dance_editor.redo)):
+            QShortcut(QKeySequence(keys), self.tab_2, slot, context=Qt.WidgetWithChildrenShortcut)
 
     def add_index(self):
         self.dance_editor.add_index()
@@ -148,8 +185,45 @@ class MainWindow(QWidget, Ui_Form):
         self.dance_editor.clear_all_frames()
 
     def on_play_group_clicked(self):
-        # 传入舵机控制器实例，让 DanceEditor 处理播放逻辑
-        self.dance_editor.play_all_frames(self.servo_ctrl)
+        # 播放中再次点击即停止
+        if self.playback.is_running():
+            self.stop_playback()
+            return
+        program = self.dance_editor.compile_program(self.servo_ctrl)
+        # 越界或无法识别的行不会播放，逐行提示而不是静默跳过
+        self.dance_editor.log_errors(self.serial_mgr)
+        if len(program) == 0:
+            self.serial_mgr.log("动作组为空，无需播放。")
+            return
+        if self.playback.play(program):
+            self.serial_mgr.log(f"开始播放：{program.move_count} 条动作，共 {program.total_ms}ms 延时")
+            self.pushButton_playGroup.setText("停止播放")
+
+    def stop_playback(self):
+        if self.playback.is_running():
+            self.playback.stop()
+
+    def toggle_pause_playback(self):
+        if not self.playback.is_running():
+            return
+        if self.playback.state == STATE_PAUSED:
+            self.playback.resume()
+            self.pushButton_playGroup.setText("停止播放")
+        else:
+            self.playback.pause()
+            self.pushButton_playGroup.setText("已暂停（Ctrl+Space 继续）")
+
+    def on_playback_progress(self, index, total):
+        self.pushButton_playGroup.setText(f"停止播放 {index}/{total}")
+
+    def on_playback_finished(self, completed):
+        self.pushButton_playGroup.setText(self.play_button_text)
+        self.serial_mgr.log("播放完成。" if completed else "播放已停止。")
+        stats = self.playback.scheduler.summary()
+        if stats["steps"]:
+            self.serial_mgr.log(
+                f"节拍误差：{stats['steps']} 步，最大迟到 {stats['max_ms']:.2f}ms，平均 {stats['mean_ms']:.2f}ms"
+            )
 
     def pushButton_insertmove_clicked(self):
         insert_line = int(self.lineEdit_confirm.text())
@@ -171,8 +245,8 @@ class MainWindow(QWidget, Ui_Form):
         delateline = int(self.lineEdit_confirm.text()) - 1
         self.dance_editor.delete_line(delateline)
     def populate_serial_ports(self):
+        # 直接使用 PortMonitor 维护的列表，不再重复枚举
         self.comboBox_ports.clear()
-        self.serial_mgr.refresh_ports()
         self.comboBox_ports.addItem("请选择你的串口...")
         for p in self.serial_mgr.ports_list:
             display = f"{p.device} ({p.description})"
@@ -186,43 +260,115 @@ class MainWindow(QWidget, Ui_Form):
         if not port:
             self.serial_mgr.log("未选择有效串口。")
             return
+        self.open_port(port)
+
+    def open_port(self, port: str) -> bool:
+        """按当前串口参数打开串口；波特率为 auto 时先按默认值打开再探测"""
+        baudrate = self.serial_settings["baudrate"]
+        auto = baudrate == BAUDRATE_AUTO
         self.serial_mgr.close()
-        ok = self.serial_mgr.open(port)
+        ok = self.serial_mgr.open(port, DEFAULT_BAUDRATE if auto else baudrate,
+                                  write_timeout=self.serial_settings["write_timeout"])
         if ok:
+            if auto:
+                self.servo_ctrl.detect_baudrate()
             self.serial = self.serial_mgr.get_native()
+        return ok
+
+    def setup_baud_combo(self):
+        """在串口下拉框右侧加入波特率选择（界面文件中没有该控件，这里用代码插入同一行布局）"""
+        self.comboBox_baud = QComboBox(self.layoutWidget1)
+        self.comboBox_baud.setMinimumSize(self.comboBox_ports.minimumSize())
+        self.comboBox_baud.setFont(self.comboBox_ports.font())
+        self.comboBox_baud.addItem("自动探测", BAUDRATE_AUTO)
+        for baudrate in BAUD_RATES:
+            self.comboBox_baud.addItem(str(baudrate), baudrate)
+        layout = self.horizontalLayout_6
+        layout.insertWidget(layout.indexOf(self.comboBox_ports) + 1, self.comboBox_baud)
+        self._set_baud_silently(self.serial_settings["baudrate"])
+        self.comboBox_baud.currentIndexChanged.connect(self.on_baud_changed)
+
+    def _set_baud_silently(self, baudrate):
+        """同步波特率下拉框（配置中的非常用波特率追加为新选项），不触发重新打开串口"""
+        index = self.comboBox_baud.findData(baudrate)
+        if index == -1:
+            self.comboBox_baud.addItem(str(baudrate), baudrate)
+            index = self.comboBox_baud.count() - 1
+        self.comboBox_baud.blockSignals(True)
+        self.comboBox_baud.setCurrentIndex(index)
+        self.comboBox_baud.blockSignals(False)
+
+    def on_baud_changed(self, index):
+        settings = dict(self.serial_settings)
+        settings["baudrate"] = self.comboBox_baud.itemData(index)
+        self.apply_serial_settings(settings)
+
+    def apply_serial_settings(self, settings):
+        """更新串口参数；已连接且参数有变化时用新参数重新打开当前串口"""
+        if settings == self.serial_settings:
+            return
+        self.serial_settings = dict(settings)
+        self._set_baud_silently(settings["baudrate"])
+        port = self.serial_mgr.port
+        if port:
+            self.serial_mgr.log(f"串口参数已更新（波特率 {settings['baudrate']}），重新打开 {port}")
+            self.open_port(port)
 
-    def on_slider_changed(self):
-        # 找到哪个 slider 有焦点，再发送
-        for i in range(1, 25):
-            if self.servo_values[i]["slider"].hasFocus():
-                val = self.servo_values[i]["slider"].value()
-                self.servo_values[i]["lineEdit"].setText(str(val))
-                self.servo_ctrl.send_do(i, val, 20)
-                break
+    def _make_slider_cb(self, idx):
+        def cb(val):
+            self.on_slider_changed(idx, val)
+        return cb
 
-    def on_angle_edit_finished(self):
-        for i in range(1, 25):
-            if self.servo_values[i]["lineEdit"].hasFocus():
-                try:
-                    val = int(self.servo_values[i]["lineEdit"].text())
-                    t = int(self.servo_values[i]["lineEdit_time"].text())
-                    self.servo_values[i]["slider"].setValue(val)
-                    self.servo_ctrl.send_do(i, val, t)
-                except Exception:
-                    self.serial_mgr.log(f"舵机{i}：角度或时间输入无效")
-                break
-
-    def on_time_edit_finished(self):
-        for i in range(1, 25):
-            if self.servo_values[i]["lineEdit_time"].hasFocus():
-                try:
-                    angle = int(self.servo_values[i]["lineEdit"].text())
-                    t = int(self.servo_values[i]["lineEdit_time"].text())
-                    self.servo_values[i]["slider"].setValue(angle)
-                    self.servo_ctrl.send_do(i, angle, t)
-                except Exception:
-                    self.serial_mgr.log(f"舵机{i}：角度或时间输入无效")
-                break
+    def _make_angle_cb(self, idx):
+        def cb():
+            self.on_angle_edit_finished(idx)
+        return cb
+
+    def _make_time_cb(self, idx):
+        def cb():
+            self.on_time_edit_finished(idx)
+        return cb
+
+    def _set_slider_silently(self, idx, val):
+        """程序设置滑条位置，不触发滑条发送"""
+        slider = self.servo_values[idx]["slider"]
+        slider.blockSignals(True)
+        slider.setValue(val)
+        slider.blockSignals(False)
+
+    def on_slider_changed(self, i, val):
+        self.servo_values[i]["lineEdit"].setText(str(val))
+        self.coalescer.submit(i, val, 20)
+        if not self.coalesce_timer.isActive():
+            self.coalesce_timer.start()
+
+    def flush_slider_commands(self):
+        """定时发送滑条合并后的最新目标，空闲时停止定时器"""
+        if not self.coalescer.has_pending():
+            self.coalesce_timer.stop()
+            return
+        self.coalescer.flush()
+
+    def set_slider_rate(self, rate_hz: float):
+        """设置滑条指令的最高发送频率"""
+        self.coalescer.set_rate(rate_hz)
+        self.coalesce_timer.setInterval(self.coalescer.interval_ms)
+
+    def on_angle_edit_finished(self, i):
+        self._send_from_edits(i)
+
+    def on_time_edit_finished(self, i):
+        self._send_from_edits(i)
+
+    def _send_from_edits(self, i):
+        """按输入框中的角度与时间发送指令，并同步滑条"""
+        try:
+            angle = int(self.servo_values[i]["lineEdit"].text())
+            t = int(self.servo_values[i]["lineEdit_time"].text())
+            self._set_slider_silently(i, angle)
+            self.servo_ctrl.send_do(i, angle, t)
+        except Exception:
+            self.serial_mgr.log(f"舵机{i}：角度或时间输入无效")
 
     def servo_init(self):
         """
@@ -232,17 +378,18 @@ class MainWindow(QWidget, Ui_Form):
             self.serial_mgr.log("未加载配置文件，请先导入 config.json")
             return
         servos = self.config_data.get("servos", {})
+        poses = []
         for i in range(1, 25):
             key = str(i)
             val = int(servos.get(key, 120))
             try:
-                self.servo_values[i]["slider"].setValue(val)
+                self._set_slider_silently(i, val)
                 self.servo_values[i]["lineEdit"].setText(str(val))
-                # 发送舵机指令
-                self.servo_ctrl.send_do(i, val, 500)
-                time.sleep(0.00001)
+                poses.append((i, val, 500))
             except Exception as e:
                 self.serial_mgr.log(f"舵机初始化写入失败: {e}")
+        # 24 路指令合并为一次写入，减少各关节起动时间差
+        self.servo_ctrl.send_frame(poses)
         self.serial_mgr.log("机器人初始化完成。")
 
     def import_init(self):
@@ -253,6 +400,7 @@ class MainWindow(QWidget, Ui_Form):
             cfg = load_config(path)
             self.config_data = cfg
             self.serial_mgr.log(f"配置文件 {cfg.get('name','<unnamed>')} 导入成功。")
+            self.apply_serial_settings(cfg["serial"])
             # 解锁其他选项卡（如果存在）
             try:
                 self.tabWidget.setTabEnabled(1, True)
@@ -264,6 +412,21 @@ class MainWindow(QWidget, Ui_Form):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"加载配置失败: {e}")
 
+    def export_telemetry(self):
+        """导出记录的遥测数据（CSV 或 .npy）"""
+        path, selected = QFileDialog.getSaveFileName(
+            self, "导出遥测数据", "./telemetry.csv", "CSV 文件 (*.csv);;NumPy 文件 (*.npy)")
+        if not path:
+            return
+        try:
+            if path.endswith(".npy") or (selected.startswith("NumPy") and not path.endswith(".csv")):
+                self.telemetry.export_npy(path)
+            else:
+                self.telemetry.export_csv(path)
+            self.serial_mgr.log(f"已导出 {len(self.telemetry)} 条遥测数据到 {path}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出遥测数据失败: {e}")
+
     def open_createwindow(self):
         self.create_window = ConfigWindow(parent=self)
         self.create_window.show()
@@ -283,6 +446,9 @@ class MainWindow(QWidget, Ui_Form):
             if hasattr(self, "create_window") and self.create_window:
                 self.create_window.close()
         finally:
+            self.playback.stop()
+            self.port_monitor.close()
+            self.serial_mgr.stop_writer()
             self.serial_mgr.close()
             super().closeEvent(event)
 
@@ -353,7 +519,9 @@ class ConfigWindow(QWidget, Ui_Form2):
         # 保存
         try:
             from config_manager import save_config
-            save_config(filename, default_name, servos)
+            # 新配置沿用主窗口当前的串口参数
+            serial = getattr(self.parent, "serial_settings", None)
+            save_config(filename, default_name, servos, serial=serial)
             QMessageBox.information(self, "成功", f"配置已保存: {filename}")
         except Exception as e:
             QMessageBox.critical(self, "失败", f"保存配置失败: {e}")
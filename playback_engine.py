@@ -0,0 +1,168 @@
+"""
+playback_engine.py
+在独立工作线程中播放编译后的动作程序，支持 播放/暂停/停止/跳转
+通过回调上报进度，不依赖 Qt（界面侧可在回调中转发为 Qt 信号）
+延时按播放起点的绝对截止时间执行，不会因写串口/日志耗时而累积漂移
+"""
+import threading
+import time
+from dance_program import OP_SEND
+from scheduler import DeadlineScheduler
+
+STATE_STOPPED = "stopped"
+STATE_PLAYING = "playing"
+STATE_PAUSED = "paused"
+
+
+class PlaybackEngine:
+    def __init__(self, serial_mgr, on_progress=None, on_finished=None):
+        """
+        :param serial_mgr: 负责实际写串口的 SerialManager
+        :param on_progress: 回调 (index, total)，每执行一条指令调用一次（工作线程中）
+        :param on_finished: 回调 (completed: bool)，播放结束或被停止时调用（工作线程中）
+        """
+        self.serial_mgr = serial_mgr
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.scheduler = DeadlineScheduler()
+        # 可选的 TelemetryRecorder，记录播放时下发的目标角度
+        self.recorder = None
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._program = None
+        self._state = STATE_STOPPED
+        self._index = 0
+        self._seek_to = None
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def position(self):
+        """当前执行到的指令下标"""
+        return self._index
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, program, start: int = 0) -> bool:
+        """从 start 开始播放 program；若已在播放则先停止"""
+        self.stop()
+        if not self.serial_mgr.is_open():
+            self.serial_mgr.log("串口未打开，无法播放动作。")
+            return False
+        with self._cond:
+            self._program = program
+            self._index = max(0, min(start, len(program)))
+            self._seek_to = None
+            self._state = STATE_PLAYING
+        self._thread = threading.Thread(target=self._run, name="PlaybackEngine", daemon=True)
+        self._thread.start()
+        return True
+
+    def pause(self):
+        with self._cond:
+            if self._state == STATE_PLAYING:
+                self._state = STATE_PAUSED
+                self._cond.notify_all()
+
+    def resume(self):
+        with self._cond:
+            if self._state == STATE_PAUSED:
+                self._state = STATE_PLAYING
+                self._cond.notify_all()
+
+    def stop(self, timeout: float = 1.0):
+        """停止播放并等待工作线程退出（当前正在等待的延时会立即中断）"""
+        with self._cond:
+            if self._state != STATE_STOPPED:
+                self._state = STATE_STOPPED
+                self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def seek(self, index: int):
+        """跳转到第 index 条指令继续执行（当前延时被中断）"""
+        with self._cond:
+            if self._program is None:
+                return
+            self._seek_to = max(0, min(index, len(self._program)))
+            self._cond.notify_all()
+
+    def _pause_wait(self):
+        """在锁内等待暂停结束，暂停时长整体顺延后续截止时间"""
+        if self._state == STATE_PAUSED and self._seek_to is None:
+            paused_at = time.perf_counter_ns()
+            while self._state == STATE_PAUSED and self._seek_to is None:
+                self._cond.wait()
+            self.scheduler.shift(time.perf_counter_ns() - paused_at)
+
+    def _wait_until(self, offset_ms: int) -> bool:
+        """
+        等待到时间轴上的 offset_ms 时刻，可被暂停/停止/跳转打断
+        返回 False 表示应中断当前指令流
+        """
+        scheduler = self.scheduler
+        with self._cond:
+            while True:
+                self._pause_wait()
+                if self._state == STATE_STOPPED or self._seek_to is not None:
+                    return False
+                remaining = scheduler.remaining_ns(offset_ms)
+                if remaining <= scheduler.spin_ns:
+                    break
+                self._cond.wait((remaining - scheduler.spin_ns) / 1e9)
+        scheduler.spin_until(offset_ms)
+        return True
+
+    def _run(self):
+        program = self._program
+        total = len(program)
+        scheduler = self.scheduler
+        offset = program.offset_ms(self._index)
+        scheduler.start(offset)
+        completed = False
+        try:
+            while True:
+                with self._cond:
+                    # 暂停中跳转只移动位置，应用后重新等待暂停结束，不能直接发出目标指令
+                    while True:
+                        self._pause_wait()
+                        if self._state == STATE_STOPPED or self._seek_to is None:
+                            break
+                        self._index, self._seek_to = self._seek_to, None
+                        offset = program.offset_ms(self._index)
+                        scheduler.start(offset)
+                    if self._state == STATE_STOPPED:
+                        break
+                    index = self._index
+                if index >= total:
+                    completed = True
+                    break
+
+                op, payload = program.step(index)
+                if op == OP_SEND:
+                    scheduler.mark(offset)
+                    if not self.serial_mgr.write_bytes(payload):
+                        break
+                    if self.recorder is not None:
+                        self.recorder.record_packets(payload)
+                else:
+                    if not self._wait_until(offset + payload):
+                        continue
+                    offset += payload
+
+                with self._cond:
+                    if self._seek_to is None:
+                        self._index = index + 1
+                if self.on_progress:
+                    self.on_progress(index + 1, total)
+        finally:
+            with self._cond:
+                self._state = STATE_STOPPED
+            if self.on_finished:
+                self.on_finished(completed)
@@ -0,0 +1,62 @@
+"""
+scheduler.py
+基于 perf_counter_ns 的绝对截止时间调度器
+所有时间点都从播放起点累加计算，写串口、打日志的耗时不会累积成漂移
+"""
+import time
+from array import array
+
+SPIN_NS = 1_000_000  # 最后 1ms 改为忙等，弥补系统 sleep 精度不足
+
+
+class DeadlineScheduler:
+    def __init__(self, spin_ns: int = SPIN_NS):
+        self.spin_ns = spin_ns
+        self._t0 = 0
+        self.lateness_ns = array("q")  # 每一步实际执行时刻 - 计划时刻
+
+    def start(self, offset_ms: int = 0):
+        """以当前时刻作为 offset_ms 处的时间点开始计时，并清空迟到记录"""
+        self._t0 = time.perf_counter_ns() - offset_ms * 1_000_000
+        self.lateness_ns = array("q")
+
+    def shift(self, delta_ns: int):
+        """整体推后所有截止时间（用于暂停）"""
+        self._t0 += delta_ns
+
+    def deadline_ns(self, offset_ms: int) -> int:
+        return self._t0 + offset_ms * 1_000_000
+
+    def remaining_ns(self, offset_ms: int) -> int:
+        """距离 offset_ms 截止时间还剩多少纳秒（可能为负）"""
+        return self.deadline_ns(offset_ms) - time.perf_counter_ns()
+
+    def spin_until(self, offset_ms: int):
+        """忙等到截止时间，仅用于最后不足 spin_ns 的一小段"""
+        deadline = self.deadline_ns(offset_ms)
+        while time.perf_counter_ns() < deadline:
+            pass
+
+    def sleep_until(self, offset_ms: int):
+        """阻塞直到截止时间：先粗睡，最后一小段忙等"""
+        remaining = self.remaining_ns(offset_ms)
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) / 1e9)
+        self.spin_until(offset_ms)
+
+    def mark(self, offset_ms: int) -> int:
+        """记录当前这一步相对计划时刻的迟到量（纳秒）并返回"""
+        late = time.perf_counter_ns() - self.deadline_ns(offset_ms)
+        self.lateness_ns.append(late)
+        return late
+
+    def summary(self) -> dict:
+        """迟到统计（毫秒）"""
+        values = self.lateness_ns
+        if not values:
+            return {"steps": 0, "max_ms": 0.0, "mean_ms": 0.0}
+        return {
+            "steps": len(values),
+            "max_ms": max(values) / 1e6,
+            "mean_ms": sum(values) / len(values) / 1e6,
+        }
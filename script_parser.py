@@ -0,0 +1,107 @@
+"""
+script_parser.py
+Servo_Do(...) / HAL_Delay(...) 脚本解析器（不依赖 Qt，可用于批处理工具）
+整篇文本用一个预编译正则 finditer 一次扫描完成，每行恰好产生一个匹配，
+返回带行号的指令列表以及错误列表
+"""
+import re
+from typing import NamedTuple, List, Union
+
+MAX_SERVO_ID = 253
+MAX_ANGLE = 240
+MAX_TIME_MS = 30000
+MAX_DELAY_MS = 3_600_000        # 单条 HAL_Delay 上限（1 小时）
+MAX_TOTAL_MS = 0xFFFFFFFF       # 时间轴总长上限（编译与 .svc 文件均以 uint32 保存毫秒）
+
+# 分组：Servo_Do 的 (id, angle, time)、HAL_Delay 的 delay、无法识别行的 bad；
+# 空行与纯注释行走不带分组的分支，各分组均为空串
+_TOKEN = re.compile(r"""
+    ^[ \t]*(?:
+        Servo_Do[ \t]*\([ \t]*(\d+)[ \t]*,[ \t]*(\d+)[ \t]*,[ \t]*(\d+)[ \t]*\)
+      | HAL_Delay[ \t]*\([ \t]*(\d+)[ \t]*\)
+      | (?=//|\r?$)
+      | ([^\n]+)
+    )[^\n]*$
+""", re.M | re.X)
+
+
+class ServoDo(NamedTuple):
+    line: int
+    servo_id: int
+    angle: int
+    time_ms: int
+
+
+class Delay(NamedTuple):
+    line: int
+    delay_ms: int
+
+
+class ParseError(NamedTuple):
+    line: int
+    text: str
+    message: str
+
+
+Instruction = Union[ServoDo, Delay]
+
+
+class ParseResult(NamedTuple):
+    instructions: List[Instruction]
+    errors: List[ParseError]
+    line_count: int
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def parse_script(text: str) -> ParseResult:
+    """解析整篇脚本；空行与纯注释行忽略，无法识别或数值越界的行记入 errors"""
+    instructions = []
+    errors = []
+    append = instructions.append
+    line = 0
+    total_ms = 0
+    # findall 在 C 层一次扫描整篇文本，每行恰好产生一个匹配
+    for line, (servo_id, angle, time_ms, delay, bad) in enumerate(_TOKEN.findall(text), 1):
+        if time_ms:
+            servo_id, angle, time_ms = int(servo_id), int(angle), int(time_ms)
+            if servo_id <= MAX_SERVO_ID and angle <= MAX_ANGLE and time_ms <= MAX_TIME_MS:
+                append(ServoDo(line, servo_id, angle, time_ms))
+            else:
+                errors.append(_range_error(line, servo_id, angle, time_ms))
+        elif delay:
+            delay = int(delay)
+            total_ms += delay
+            if delay <= MAX_DELAY_MS and total_ms <= MAX_TOTAL_MS:
+                append(Delay(line, delay))
+            else:
+                total_ms -= delay
+                errors.append(_delay_error(line, delay))
+        elif bad:
+            errors.append(ParseError(line, bad, "无法识别的语句"))
+    return ParseResult(instructions, errors, line)
+
+
+def _range_error(line: int, servo_id: int, angle: int, time_ms: int) -> ParseError:
+    text = f"Servo_Do({servo_id}, {angle}, {time_ms})"
+    if servo_id > MAX_SERVO_ID:
+        return ParseError(line, text, f"舵机 ID 超出范围 (0~{MAX_SERVO_ID})")
+    if angle > MAX_ANGLE:
+        return ParseError(line, text, f"角度超出范围 (0~{MAX_ANGLE})")
+    return ParseError(line, text, f"时间超出范围 (0~{MAX_TIME_MS}ms)")
+
+
+def _delay_error(line: int, delay_ms: int) -> ParseError:
+    text = f"HAL_Delay({delay_ms})"
+    if delay_ms > MAX_DELAY_MS:
+        return ParseError(line, text, f"延时超出范围 (0~{MAX_DELAY_MS}ms)")
+    return ParseError(line, text, f"脚本总时长超出范围 (0~{MAX_TOTAL_MS}ms)")
+
+
+def format_instruction(ins: Instruction) -> str:
+    """指令还原为脚本文本（不含行号注释）"""
+    if isinstance(ins, Delay):
+        return f"HAL_Delay({ins.delay_ms});"
+    return f"Servo_Do({ins.servo_id}, {ins.angle}, {ins.time_ms});"
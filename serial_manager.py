@@ -1,28 +1,48 @@
 """
 serial_manager.py
-封装串口操作（列出、打开、关闭、写入、日志），新增定时器自动刷新串口列表。
+封装串口操作（列出、打开、关闭、读写、日志），不依赖 Qt、不做后台轮询。
+可选后台写线程：写入先进入有界队列，由写线程合并后一次写出。
+串口热插拔检测见 serial_monitor.py（Qt 适配层）。
 """
+import select
+import threading
+import time
+from collections import deque
 import serial
 import serial.tools.list_ports
 from typing import Optional
-from PySide6.QtCore import QTimer
+
+WRITE_QUEUE_SIZE = 256    # 后台写队列最多缓存的数据块数
+RATE_WINDOW = 1.0         # 吞吐统计窗口（秒）
+READ_POLL_INTERVAL = 0.0005  # 无法 select 的平台上轮询接收缓冲区的间隔（秒）
 
 class SerialManager:
-    def __init__(self, logger=None, refresh_interval: int = 1000):
+    def __init__(self, logger=None):
         """
         初始化串口管理器
         :param logger: 日志输出对象
-        :param refresh_interval: 串口列表刷新间隔（毫秒），默认 1 秒
         """
         self.logger = logger
         self._serial: Optional[serial.Serial] = None
-        self.ports_list = self.list_ports()  # 初始串口列表
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+        # 后台写线程相关
+        self._writer: Optional[threading.Thread] = None
+        self._writer_running = False
+        self._write_queue = deque()
+        self._write_cond = threading.Condition()
+        self._writer_busy = False
+        self.write_queue_size = WRITE_QUEUE_SIZE
 
-        # 初始化定时器
-        self.refresh_timer = QTimer()
-        self.refresh_timer.setInterval(refresh_interval)  # 设置刷新间隔
-        self.refresh_timer.timeout.connect(self._auto_refresh_ports)  # 绑定刷新函数
-        self.refresh_timer.start()  # 启动定时器
+        # 统计
+        self.bytes_written = 0
+        self.write_count = 0
+        self.peak_queue_depth = 0
+        self._rate_samples = deque()  # (时间, 字节数)
+        self._rate_bytes = 0          # _rate_samples 中的字节总数
+        self._rate_lock = threading.Lock()  # 写线程更新、界面线程读取
+        self.ports_list = []  # 最近一次枚举的串口列表，按需调用 refresh_ports() 更新
 
     def log(self, msg: str):
         if self.logger and hasattr(self.logger, "append"):
@@ -43,46 +63,18 @@ class SerialManager:
         self.ports_list = self.list_ports()
         return self.ports_list
 
-    def _auto_refresh_ports(self):
-        """定时器回调：自动刷新串口列表（内部使用）"""
-        old_ports = set(p.device for p in self.ports_list)  # 旧串口设备名集合
-        new_ports = self.list_ports()  # 扫描新串口列表
-        new_ports_devices = set(p.device for p in new_ports)  # 新串口设备名集合
-
-        # 对比新旧串口列表，输出变化日志
-        added_ports = new_ports_devices - old_ports  # 新增的串口
-        removed_ports = old_ports - new_ports_devices  # 移除的串口
-
-        if added_ports:
-            self.log(f"新增串口: {', '.join(added_ports)}")
-        if removed_ports:
-            self.log(f"移除串口: {', '.join(removed_ports)}")
-
-        # 更新串口列表
-        self.ports_list = new_ports
-
-    def set_refresh_interval(self, interval: int):
-        """设置串口刷新间隔（毫秒）"""
-        if interval > 0:
-            self.refresh_timer.setInterval(interval)
-            self.log(f"串口刷新间隔已设置为 {interval}ms")
-
-    def stop_refresh(self):
-        """停止自动刷新串口列表"""
-        self.refresh_timer.stop()
-        self.log("串口自动刷新已停止")
-
-    def start_refresh(self):
-        """启动自动刷新串口列表（默认初始化时已启动）"""
-        self.refresh_timer.start()
-        self.log("串口自动刷新已启动")
-
-    def open(self, port: str, baudrate: int = 115200, timeout: float = 1):
+    def open(self, port: str, baudrate: int = 115200, timeout: float = 1,
+             write_timeout: Optional[float] = None):
+        """
+        打开串口
+        :param write_timeout: 写超时（秒），None 表示一直阻塞直到写完
+        """
         try:
             if self._serial and self._serial.is_open:
                 self.log(f"已有串口连接: {self._serial.port}. 先关闭再打开新串口。")
                 self.close()
-            self._serial = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
+            self._serial = serial.Serial(port=port, baudrate=baudrate, timeout=timeout,
+                                         write_timeout=write_timeout)
             if self._serial.is_open:
                 self.log(f"已打开串口: {port} ({baudrate})")
                 return True
@@ -95,6 +87,8 @@ class SerialManager:
             return False
 
     def close(self):
+        # 关闭前尽量把队列中的数据写完
+        self.drain(timeout=1.0)
         try:
             if self._serial and self._serial.is_open:
                 self._serial.close()
@@ -103,24 +97,230 @@ class SerialManager:
         except Exception as e:
             self.log(f"关闭串口异常: {e}")
 
+    @property
+    def port(self) -> Optional[str]:
+        return self._serial.port if self.is_open() else None
+
+    @property
+    def baudrate(self) -> int:
+        return self._serial.baudrate if self.is_open() else 0
+
+    @property
+    def write_timeout(self) -> Optional[float]:
+        return self._serial.write_timeout if self.is_open() else None
+
+    def set_baudrate(self, baudrate: int) -> bool:
+        """不关闭串口直接切换波特率（先等待已排队的数据写完）"""
+        if not self.is_open():
+            return False
+        self.flush(timeout=1.0)
+        try:
+            with self._write_lock, self._read_lock:
+                self._serial.baudrate = baudrate
+            return True
+        except Exception as e:
+            self.log(f"设置波特率失败: {e}")
+            return False
+
     def is_open(self):
         return self._serial is not None and self._serial.is_open
 
     def write_bytes(self, data: bytes):
+        """写入串口；启用后台写线程时仅入队，立即返回"""
         if not self.is_open():
             self.log("写入失败：串口未打开。")
             return False
+        if self._writer_running:
+            return self._enqueue(bytes(data))
+        return self._write_now(data)
+
+    def read_bytes(self, size: int = 1, timeout: Optional[float] = None) -> bytes:
+        """
+        读取最多 size 字节（已到达的数据多于 size 时一并读出）
+        timeout 为本次读取的超时，None 表示沿用打开时的设置；
+        指定 timeout 时按自己的截止时间等待 in_waiting，不修改串口的 timeout 设置
+        （pyserial 每次修改 timeout 都会重新 tcsetattr 配置端口）
+        """
+        if not self.is_open():
+            return b""
         try:
-            self._serial.write(data)
+            with self._read_lock:
+                ser = self._serial
+                if timeout is None:
+                    return ser.read(max(size, ser.in_waiting))
+                waiting = self._wait_input(ser, size, time.monotonic() + timeout)
+                return ser.read(waiting) if waiting else b""
+        except Exception as e:
+            self.log(f"读取串口失败: {e}")
+            return b""
+
+    @staticmethod
+    def _wait_input(ser, size: int, deadline: float) -> int:
+        """等到接收缓冲区至少有 size 字节或到达截止时间，返回已到达的字节数"""
+        try:
+            fileno = ser.fileno()
+        except (AttributeError, OSError, ValueError):
+            fileno = None   # Windows 等平台
+        byte_time = 10 / ser.baudrate if ser.baudrate else READ_POLL_INTERVAL
+        while True:
+            waiting = ser.in_waiting
+            if waiting >= size:
+                return waiting
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return waiting
+            if waiting == 0 and fileno is not None:
+                # 缓冲区为空时阻塞到第一个字节到达
+                select.select([fileno], [], [], remaining)
+            else:
+                # 已收到部分数据：按剩余字节的传输时间等待
+                time.sleep(min(remaining, max((size - waiting) * byte_time, READ_POLL_INTERVAL)))
+
+    def clear_input(self):
+        """丢弃接收缓冲区中尚未读取的数据"""
+        if not self.is_open():
+            return
+        try:
+            with self._read_lock:
+                self._serial.reset_input_buffer()
+        except Exception as e:
+            self.log(f"清空接收缓冲区失败: {e}")
+
+    def _write_now(self, data) -> bool:
+        try:
+            with self._write_lock:
+                self._serial.write(data)
+            self._count_written(len(data))
             return True
         except Exception as e:
             self.log(f"写入串口失败: {e}")
             return False
 
+    def _count_written(self, n: int):
+        now = time.monotonic()
+        with self._rate_lock:
+            self.bytes_written += n
+            self.write_count += 1
+            samples = self._rate_samples
+            samples.append((now, n))
+            self._rate_bytes += n
+            while samples and now - samples[0][0] > RATE_WINDOW:
+                self._rate_bytes -= samples.popleft()[1]
+
+    # ---------------- 后台写线程 ----------------
+    def start_writer(self, queue_size: int = WRITE_QUEUE_SIZE):
+        """启动后台写线程，此后 write_bytes 只负责入队"""
+        if self._writer_running:
+            return
+        self.write_queue_size = max(1, queue_size)
+        self._writer_running = True
+        self._writer = threading.Thread(target=self._writer_loop, name="SerialWriter", daemon=True)
+        self._writer.start()
+
+    def stop_writer(self, timeout: float = 1.0):
+        """写完队列中剩余数据后停止后台写线程"""
+        if not self._writer_running:
+            return
+        self.drain(timeout)
+        with self._write_cond:
+            self._writer_running = False
+            self._write_cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout)
+        self._writer = None
+
+    def _enqueue(self, data: bytes) -> bool:
+        with self._write_cond:
+            if len(self._write_queue) >= self.write_queue_size:
+                # 队列满时短暂阻塞等待写线程，形成背压
+                if not self._write_cond.wait_for(
+                        lambda: len(self._write_queue) < self.write_queue_size or not self._writer_running,
+                        timeout=1.0):
+                    self.log("写入失败：发送队列已满。")
+                    return False
+            self._write_queue.append(data)
+            depth = len(self._write_queue)
+            if depth > self.peak_queue_depth:
+                self.peak_queue_depth = depth
+            self._write_cond.notify_all()
+        return True
+
+    def _writer_loop(self):
+        queue = self._write_queue
+        while True:
+            with self._write_cond:
+                while not queue and self._writer_running:
+                    self._write_cond.wait()
+                if not queue:
+                    break
+                # 合并所有待发数据为一次写入
+                chunks = list(queue)
+                queue.clear()
+                self._writer_busy = True
+                self._write_cond.notify_all()
+            data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+            if self.is_open():
+                self._write_now(data)
+            else:
+                self.log(f"写入失败：串口未打开，丢弃 {len(data)} 字节。")
+            with self._write_cond:
+                self._writer_busy = False
+                self._write_cond.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待发送队列清空并全部交给系统串口驱动；超时返回 False"""
+        if not self._writer_running:
+            return True
+        with self._write_cond:
+            return self._write_cond.wait_for(
+                lambda: not self._write_queue and not self._writer_busy, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """drain 之后再等待驱动缓冲区真正发送完毕"""
+        if not self.drain(timeout):
+            return False
+        if not self.is_open():
+            return True
+        try:
+            with self._write_lock:
+                self._serial.flush()
+            return True
+        except Exception as e:
+            self.log(f"串口 flush 失败: {e}")
+            return False
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._write_queue)
+
+    @property
+    def bytes_per_sec(self) -> float:
+        """最近 RATE_WINDOW 秒内的平均写出速率"""
+        with self._rate_lock:
+            samples = self._rate_samples
+            if not samples:
+                return 0.0
+            if time.monotonic() - samples[-1][0] > RATE_WINDOW:
+                return 0.0
+            return self._rate_bytes / RATE_WINDOW
+
+    def writer_stats(self) -> dict:
+        """写入统计：队列深度、吞吐量以及链路占用率（按 10 bit/字节估算）"""
+        rate = self.bytes_per_sec
+        baudrate = self.baudrate
+        return {
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "bytes_written": self.bytes_written,
+            "writes": self.write_count,
+            "bytes_per_sec": rate,
+            "link_utilization": rate * 10 / baudrate if baudrate else 0.0,
+        }
+
     def get_native(self):
         return self._serial
 
     def __del__(self):
-        """析构时停止定时器，避免资源泄漏"""
-        self.refresh_timer.stop()
+        """析构时停止写线程并关闭串口，避免资源泄漏"""
+        self.stop_writer()
         self.close()
\ No newline at end of file
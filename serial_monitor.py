@@ -0,0 +1,172 @@
+"""
+serial_monitor.py
+串口热插拔监视（Qt 适配层）：串口集合变化时发出 portsChanged 信号。
+Linux 上用 inotify 监听 /dev 下设备节点的创建/删除（ctypes 调用 libc，QSocketNotifier 接入事件循环），
+只有出现 tty 类设备节点变化时才重新枚举串口；其他平台或 inotify 不可用时退回定时轮询。
+SerialManager 本身不依赖 Qt，命令行和测试脚本不需要这个模块。
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from PySide6.QtCore import QObject, QTimer, QSocketNotifier, Signal
+
+DEV_DIR = b"/dev"
+SETTLE_MS = 200   # 设备节点出现后等待 udev 完成 sysfs/权限设置再枚举
+
+# <sys/inotify.h>
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, len
+
+# 串口类设备节点名前缀（ttyUSB、ttyACM、ttyS、rfcomm 等）
+SERIAL_PREFIXES = (b"tty", b"rfcomm")
+
+
+def _open_inotify(path: bytes):
+    """创建监听 path 的 inotify 描述符，不支持时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+    if libc.inotify_add_watch(fd, path, mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _serial_names(data: bytes) -> list:
+    """从 inotify 事件缓冲区中取出串口类设备节点名"""
+    names = []
+    offset = 0
+    size = EVENT_HEADER.size
+    while offset + size <= len(data):
+        _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+        name = data[offset + size:offset + size + length].rstrip(b"\0")
+        offset += size + length
+        if name.startswith(SERIAL_PREFIXES):
+            names.append(name.decode(errors="replace"))
+    return names
+
+
+class PortMonitor(QObject):
+    """
+    维护 SerialManager.ports_list，仅在串口集合变化时发出一次 portsChanged 信号
+    mode 为 "inotify" 或 "poll"
+    """
+    portsChanged = Signal(list)
+
+    def __init__(self, serial_mgr, refresh_interval: int = 1000, parent=None, use_inotify: bool = True):
+        """
+        :param serial_mgr: SerialManager 实例
+        :param refresh_interval: 轮询模式下的串口列表刷新间隔（毫秒），默认 1 秒
+        :param use_inotify: 是否优先使用 inotify 事件（Linux）
+        """
+        super().__init__(parent)
+        self.serial_mgr = serial_mgr
+        self.serial_mgr.refresh_ports()  # 初始串口列表
+
+        # 事件到达后延迟一次枚举，同一次插拔产生的多个节点事件合并处理
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(SETTLE_MS)
+        self._settle_timer.timeout.connect(self._auto_refresh_ports)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_interval)  # 设置刷新间隔
+        self.refresh_timer.timeout.connect(self._auto_refresh_ports)  # 绑定刷新函数
+
+        self._inotify_fd = _open_inotify(DEV_DIR) if use_inotify else None
+        self._notifier = None
+        if self._inotify_fd is not None:
+            self.mode = "inotify"
+            self._notifier = QSocketNotifier(self._inotify_fd, QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self._on_dev_event)
+        else:
+            self.mode = "poll"
+            self.refresh_timer.start()  # 启动定时器
+
+    def _on_dev_event(self, *args):
+        """/dev 下有节点变化：读空事件队列，只对串口类节点触发枚举"""
+        try:
+            data = os.read(self._inotify_fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.serial_mgr.log(f"串口监视失败，改为定时刷新: {e}")
+            self._fallback_to_poll()
+            return
+        if _serial_names(data):
+            self._settle_timer.start()
+
+    def _fallback_to_poll(self):
+        self.close()
+        self.mode = "poll"
+        self.refresh_timer.start()
+
+    def _auto_refresh_ports(self):
+        """重新枚举串口（内部使用），集合有变化时记录日志并发出信号"""
+        old_ports = set(p.device for p in self.serial_mgr.ports_list)  # 旧串口设备名集合
+        new_ports = self.serial_mgr.list_ports()  # 扫描新串口列表
+        new_ports_devices = set(p.device for p in new_ports)  # 新串口设备名集合
+
+        # 对比新旧串口列表，输出变化日志
+        added_ports = new_ports_devices - old_ports  # 新增的串口
+        removed_ports = old_ports - new_ports_devices  # 移除的串口
+
+        if added_ports:
+            self.serial_mgr.log(f"新增串口: {', '.join(sorted(added_ports))}")
+        if removed_ports:
+            self.serial_mgr.log(f"移除串口: {', '.join(sorted(removed_ports))}")
+
+        # 更新串口列表
+        self.serial_mgr.ports_list = new_ports
+        if added_ports or removed_ports:
+            self.portsChanged.emit(new_ports)
+
+    def set_refresh_interval(self, interval: int):
+        """设置轮询模式下的串口刷新间隔（毫秒）"""
+        if interval > 0:
+            self.refresh_timer.setInterval(interval)
+            self.serial_mgr.log(f"串口刷新间隔已设置为 {interval}ms")
+
+    def stop_refresh(self):
+        """停止自动刷新串口列表"""
+        self.refresh_timer.stop()
+        self._settle_timer.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+        self.serial_mgr.log("串口自动刷新已停止")
+
+    def start_refresh(self):
+        """启动自动刷新串口列表（默认初始化时已启动）"""
+        if self._notifier is not None:
+            self._notifier.setEnabled(True)
+            # 停止期间可能错过了插拔事件
+            self._auto_refresh_ports()
+        else:
+            self.refresh_timer.start()
+        self.serial_mgr.log("串口自动刷新已启动")
+
+    def close(self):
+        """停止监视并释放 inotify 描述符"""
+        self.refresh_timer.stop()
+        self._settle_timer.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+            self._notifier.deleteLater()
+            self._notifier = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
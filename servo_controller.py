@@ -2,7 +2,181 @@
 servo_controller.py
 负责封装 0x55 0x55 舵机协议
 由 SerialManager / MySerial 执行真正发送
+读指令（位置/电压/温度）的应答由 FrameParser 从字节流中解析
 """
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+DO_PACKET_SIZE = 10
+SERVO_COUNT = 24
+PACKET_CACHE_SIZE = 4096
+
+HEADER = b"\x55\x55"
+CMD_DO = 1           # 运动指令：目标位置 + 运行时间
+CMD_TEMP_READ = 26   # 读温度，应答 1 字节 (℃)
+CMD_VIN_READ = 27    # 读输入电压，应答 2 字节 (mV)
+CMD_POS_READ = 28    # 读当前位置，应答 2 字节有符号 (0~1000)
+READ_TIMEOUT = 0.05  # 单次读指令等待应答的超时（秒）
+# 自动探测时依次尝试的波特率：总线舵机默认 115200，部分适配器支持更高速率
+BAUD_RATES = (115200, 1000000, 500000, 230400, 57600, 9600)
+
+# 角度(0~240°) -> 位置(0~1000) 预计算表，与 int(angle * 1000 / 240) 结果一致
+ANGLE_TO_POS = tuple(int(a * 1000 / 240) for a in range(241))
+
+
+def angle_to_pos(angle_deg) -> int:
+    """角度映射到 0~1000 位置值，整数角度直接查表"""
+    if type(angle_deg) is int and 0 <= angle_deg <= 240:
+        return ANGLE_TO_POS[angle_deg]
+    return int(angle_deg * 1000 / 240)
+
+
+def pos_to_angle(pos: int) -> float:
+    """位置值 0~1000 映射回角度"""
+    return pos * 240 / 1000
+
+
+def checksum(data) -> int:
+    """协议校验和：~sum(ID..最后一个参数) & 0xFF"""
+    return ~sum(data) & 0xFF
+
+
+class ServoFrame(NamedTuple):
+    """一帧完整且校验通过的协议数据"""
+    servo_id: int
+    cmd: int
+    params: bytes
+
+
+class PositionReading(NamedTuple):
+    servo_id: int
+    position: int   # 原始位置值（可能略超出 0~1000）
+    angle: float    # 换算后的角度
+
+
+class VoltageReading(NamedTuple):
+    servo_id: int
+    millivolts: int
+
+
+class TemperatureReading(NamedTuple):
+    servo_id: int
+    celsius: int
+
+
+def parse_reading(frame: ServoFrame):
+    """把应答帧转换为对应的读数类型；非读指令应答或参数长度不符时返回 None"""
+    params = frame.params
+    if frame.cmd == CMD_POS_READ and len(params) == 2:
+        pos = int.from_bytes(params, "little", signed=True)
+        return PositionReading(frame.servo_id, pos, pos_to_angle(pos))
+    if frame.cmd == CMD_VIN_READ and len(params) == 2:
+        return VoltageReading(frame.servo_id, int.from_bytes(params, "little"))
+    if frame.cmd == CMD_TEMP_READ and len(params) == 1:
+        return TemperatureReading(frame.servo_id, params[0])
+    return None
+
+
+class FrameParser:
+    """
+    0x55 0x55 协议增量解析器
+    内部使用固定容量的环形缓冲区（未读数据不足以放下新数据时整体前移，保证帧连续），
+    iter_frames() 以 memoryview 切片返回完整帧，不做拷贝；
+    遇到帧头错误或校验失败时丢弃 1 字节重新同步
+    """
+    MIN_LEN = 3   # LEN 字段 = 参数个数 + 3
+    MAX_LEN = 10
+
+    def __init__(self, capacity: int = 4096):
+        self._buf = bytearray(max(capacity, 64))
+        self._view = memoryview(self._buf)
+        self._start = 0   # 未解析数据起点
+        self._end = 0     # 未解析数据终点
+        self.bad_frames = 0
+        self.frame_count = 0
+
+    def reset(self):
+        self._start = self._end = 0
+
+    def __len__(self):
+        """缓冲区中尚未解析的字节数"""
+        return self._end - self._start
+
+    def _compact(self):
+        """把未解析数据移到缓冲区开头"""
+        start, end = self._start, self._end
+        if start:
+            self._buf[:end - start] = self._buf[start:end]
+            self._start, self._end = 0, end - start
+
+    def writable(self) -> memoryview:
+        """
+        返回可直接写入的空闲区域（如 serial.readinto），写入后调用 commit(n)
+        """
+        if self._end == len(self._buf):
+            self._compact()
+        return self._view[self._end:]
+
+    def commit(self, n: int):
+        self._end += n
+
+    def _push(self, data) -> int:
+        """尽可能多地拷入 data，返回实际拷入的字节数"""
+        free = self.writable()
+        n = min(len(free), len(data))
+        free[:n] = data[:n]
+        self._end += n
+        return n
+
+    def iter_frames(self, data=b""):
+        """
+        接收新数据并逐个产出完整帧（memoryview，含帧头与校验和）
+        产出的切片直接引用内部缓冲区，只在下一次写入前有效
+        """
+        data = memoryview(data).cast("B") if data else None
+        while True:
+            if data is not None and len(data):
+                n = self._push(data)
+                data = data[n:]
+            yield from self._scan()
+            if data is None or not len(data):
+                break
+
+    def _scan(self):
+        buf, view = self._buf, self._view
+        while True:
+            start, end = self._start, self._end
+            pos = buf.find(HEADER, start, end)
+            if pos < 0:
+                # 保留可能是半个帧头的最后一个字节
+                self._start = end - 1 if end > start and buf[end - 1] == 0x55 else end
+                return
+            if end - pos < 4:
+                self._start = pos
+                return
+            length = buf[pos + 3]
+            if not self.MIN_LEN <= length <= self.MAX_LEN:
+                self.bad_frames += 1
+                self._start = pos + 1
+                continue
+            total = length + 3
+            if end - pos < total:
+                self._start = pos
+                return
+            last = pos + total - 1
+            if ~sum(view[pos + 2:last]) & 0xFF != buf[last]:
+                self.bad_frames += 1
+                self._start = pos + 1
+                continue
+            self._start = pos + total
+            self.frame_count += 1
+            yield view[pos:pos + total]
+
+    def feed(self, data) -> list:
+        """接收任意长度的字节块，返回其中完整且校验通过的帧 (ServoFrame)"""
+        return [ServoFrame(f[2], f[4], bytes(f[5:-1])) for f in self.iter_frames(data)]
+
 
 class ServoController:
     def __init__(self, serial_mgr):
@@ -10,18 +184,42 @@ class ServoController:
         self.HEAD = 0x55
         self.CMD_DO = 0x01
         self.LEN_DO = 0x07
+        # 整帧发送缓冲区：预分配 24 路 DO 包，避免每帧重新分配
+        self._frame_buf = bytearray(DO_PACKET_SIZE * SERVO_COUNT)
+        # DO 包 LRU 缓存：(servo_id, angle, time_ms) -> bytes
+        self._packet_cache = OrderedDict()
+        self.packet_cache_size = PACKET_CACHE_SIZE
+        self.parser = FrameParser()
+        # 可选的 TelemetryRecorder，记录下发的目标角度
+        self.recorder = None
 
     def _checksum(self, data: bytes) -> int:
         """计算校验和：~sum(data[2..8]) & 0xFF"""
-        return (~sum(data) & 0xFF) & 0xFF
+        return checksum(data)
 
     def pack_do(self, servo_id: int, angle_deg: int, time_ms: int) -> bytes:
         """
         生成 DO 指令包 (10 bytes)
         angle_deg: 0~240°
+        重复的 (servo_id, angle, time_ms) 直接返回缓存中的 bytes
         """
+        key = (servo_id, angle_deg, time_ms)
+        cache = self._packet_cache
+        packet = cache.get(key)
+        if packet is not None:
+            cache.move_to_end(key)
+            return packet
+
+        packet = self._build_do(servo_id, angle_deg, time_ms)
+        cache[key] = packet
+        while len(cache) > self.packet_cache_size:
+            cache.popitem(last=False)
+        return packet
+
+    def _build_do(self, servo_id: int, angle_deg: int, time_ms: int) -> bytes:
+        """实际组包（不经过缓存）"""
         # 角度映射到 0~1000，与原程序一致
-        angle_val = int(angle_deg * 1000 / 240)
+        angle_val = angle_to_pos(angle_deg)
 
         angle_L = angle_val & 0xFF
         angle_H = (angle_val >> 8) & 0xFF
@@ -45,6 +243,10 @@ class ServoController:
 
         return bytes(buf)
 
+    def clear_packet_cache(self):
+        """清空 DO 包缓存"""
+        self._packet_cache.clear()
+
     def send_do(self, servo_id: int, angle_deg: int, time_ms: int) -> bool:
         """发送 DO 指令"""
         if not self.serial_mgr.is_open():
@@ -55,11 +257,53 @@ class ServoController:
 
         ok = self.serial_mgr.write_bytes(packet)
         if ok:
+            if self.recorder is not None:
+                self.recorder.record_command(servo_id, angle_deg)
             self.serial_mgr.log(
                 f"DO -> id={servo_id} angle={angle_deg}° time={time_ms}ms"
             )
         return ok
 
+    def _pack_do_into(self, buf: bytearray, offset: int, servo_id: int, angle_deg: int, time_ms: int):
+        """将 DO 指令包直接写入 buf[offset:offset+10]"""
+        buf[offset:offset + DO_PACKET_SIZE] = self.pack_do(servo_id, angle_deg, time_ms)
+
+    def pack_frame(self, poses) -> memoryview:
+        """
+        将多路 DO 指令打包进预分配缓冲区
+        poses: 可迭代的 (servo_id, angle_deg, time_ms)
+        返回指向内部缓冲区的 memoryview，下次打包前有效
+        """
+        poses = list(poses)
+        size = len(poses) * DO_PACKET_SIZE
+        if size > len(self._frame_buf):
+            self._frame_buf = bytearray(size)
+        buf = self._frame_buf
+        for n, (servo_id, angle_deg, time_ms) in enumerate(poses):
+            self._pack_do_into(buf, n * DO_PACKET_SIZE, servo_id, angle_deg, time_ms)
+        return memoryview(buf)[:size]
+
+    def send_frame(self, poses) -> bool:
+        """
+        一次性发送整帧姿态（多路 DO 指令合并为一次串口写入）
+        poses: 可迭代的 (servo_id, angle_deg, time_ms)
+        """
+        if not self.serial_mgr.is_open():
+            self.serial_mgr.log("串口未打开，无法发送舵机指令。")
+            return False
+
+        poses = list(poses)
+        if not poses:
+            return True
+
+        ok = self.serial_mgr.write_bytes(self.pack_frame(poses))
+        if ok:
+            if self.recorder is not None:
+                for servo_id, angle_deg, _ in poses:
+                    self.recorder.record_command(servo_id, angle_deg)
+            self.serial_mgr.log(f"FRAME -> {len(poses)} 路舵机")
+        return ok
+
     def pack_change_id(self, new_id: int) -> bytes:
         """
         生成修改舵机 ID 的指令包
@@ -91,4 +335,69 @@ class ServoController:
             return True
         except Exception as e:
             self.serial_mgr.log(f"发送数据失败: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def pack_read(self, servo_id: int, cmd: int) -> bytes:
+        """生成读指令包 (6 bytes)：55 55 ID 03 CMD CHK"""
+        buf = bytearray([self.HEAD, self.HEAD, servo_id, 3, cmd])
+        buf.append(checksum(buf[2:5]))
+        return bytes(buf)
+
+    def query(self, servo_id: int, cmd: int, timeout: float = READ_TIMEOUT):
+        """
+        发送读指令并等待对应舵机的应答
+        返回 PositionReading / VoltageReading / TemperatureReading，超时返回 None
+        """
+        serial_mgr = self.serial_mgr
+        if not serial_mgr.is_open():
+            serial_mgr.log("串口未打开，无法读取舵机。")
+            return None
+        serial_mgr.clear_input()
+        self.parser.reset()
+        if not serial_mgr.write_bytes(self.pack_read(servo_id, cmd)):
+            return None
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            # 应答长度随指令不同（温度 7 字节，位置/电压 8 字节），有数据到达就交给解析器
+            data = serial_mgr.read_bytes(1, remaining)
+            for frame in self.parser.feed(data):
+                # 单线半双工适配器会回显请求帧，parse_reading 会因参数长度不符将其忽略
+                if frame.servo_id != servo_id or frame.cmd != cmd:
+                    continue
+                reading = parse_reading(frame)
+                if reading is not None:
+                    return reading
+
+    def read_position(self, servo_id: int, timeout: float = READ_TIMEOUT) -> Optional[PositionReading]:
+        return self.query(servo_id, CMD_POS_READ, timeout)
+
+    def read_voltage(self, servo_id: int, timeout: float = READ_TIMEOUT) -> Optional[VoltageReading]:
+        return self.query(servo_id, CMD_VIN_READ, timeout)
+
+    def read_temperature(self, servo_id: int, timeout: float = READ_TIMEOUT) -> Optional[TemperatureReading]:
+        return self.query(servo_id, CMD_TEMP_READ, timeout)
+
+    def detect_baudrate(self, candidates=BAUD_RATES, servo_ids=(1,), timeout: float = READ_TIMEOUT) -> Optional[int]:
+        """
+        自动探测总线波特率：依次切换到候选波特率，对 servo_ids 中的舵机发读位置指令，
+        收到校验正确的应答即认为匹配；都没有应答时恢复原波特率并返回 None
+        """
+        serial_mgr = self.serial_mgr
+        if not serial_mgr.is_open():
+            serial_mgr.log("串口未打开，无法探测波特率。")
+            return None
+        original = serial_mgr.baudrate
+        for baudrate in candidates:
+            if baudrate != serial_mgr.baudrate and not serial_mgr.set_baudrate(baudrate):
+                continue
+            for servo_id in servo_ids:
+                if self.read_position(servo_id, timeout) is not None:
+                    serial_mgr.log(f"探测到波特率: {baudrate}（舵机 {servo_id} 应答）")
+                    return baudrate
+        serial_mgr.set_baudrate(original)
+        serial_mgr.log("未探测到舵机应答，保持原波特率。")
+        return None
@@ -0,0 +1,262 @@
+"""
+servo_player.py
+无界面命令行播放器（不导入 Qt），用于没有桌面环境的演出机
+    python -m servo_player play show.txt --port /dev/ttyUSB0
+    python -m servo_player check show.txt
+    python -m servo_player convert show.txt show.svc
+    python -m servo_player analyze show.txt --baud 115200
+    python -m servo_player probe --port /dev/ttyUSB0
+支持的文件：Servo_Do/HAL_Delay 文本脚本、ActionGroup 文本（每行 48 个数）、.svc 二进制编舞文件
+"""
+import argparse
+import sys
+import threading
+from action_group import ActionGroup, FRAME_WIDTH
+from bus_budget import analyze, bursts_from_script, bursts_from_action_group, bursts_from_program
+from choreo_file import ChoreoFile, MAGIC, KIND_SCRIPT, write_script, write_frames
+from dance_program import compile_script, compile_frames
+from playback_engine import PlaybackEngine
+from script_parser import parse_script
+from servo_controller import ServoController, BAUD_RATES
+
+
+def _is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _looks_like_frames(text: str) -> bool:
+    """ActionGroup 文本：首个非空行为 48 个逗号分隔的整数"""
+    for line in text.split('\n'):
+        line = line.strip()
+        if line:
+            return len(line.split(",")) == FRAME_WIDTH
+    return False
+
+
+def load_program(path: str, servo_ctrl):
+    """
+    读取文件并返回可播放的程序；.svc 文件直接映射播放
+    返回 (program, closer)，closer 为需要在播放后关闭的对象或 None
+    """
+    if _is_binary(path):
+        f = ChoreoFile(path)
+        if f.kind == KIND_SCRIPT:
+            return f, f
+        with f:
+            group = f.to_action_group()
+        return compile_frames(group, servo_ctrl), None
+    text = _read_text(path)
+    if _looks_like_frames(text):
+        group = ActionGroup()
+        group.from_lines(text.split('\n'))
+        return compile_frames(group, servo_ctrl), None
+    return compile_script(text, servo_ctrl), None
+
+
+def _baud_arg(text: str):
+    """--baud 参数：整数或 auto"""
+    if text == "auto":
+        return text
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"波特率无效: {text}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"波特率无效: {text}")
+    return value
+
+
+def open_serial(args, serial_mgr, servo_ctrl) -> bool:
+    """按 --baud / --write-timeout 打开串口；--baud auto 时探测总线波特率"""
+    auto = args.baud == "auto"
+    if not serial_mgr.open(args.port, BAUD_RATES[0] if auto else args.baud,
+                           write_timeout=args.write_timeout):
+        return False
+    if auto and servo_ctrl.detect_baudrate() is None:
+        serial_mgr.close()
+        return False
+    return True
+
+
+def _serial_manager():
+    """只有播放 / 探测需要串口；检查、转换、分析不依赖 pyserial"""
+    from serial_manager import SerialManager
+    return SerialManager()
+
+
+def cmd_play(args) -> int:
+    serial_mgr = _serial_manager()
+    servo_ctrl = ServoController(serial_mgr)
+    program, closer = load_program(args.file, servo_ctrl)
+    # .svc 文件在播放期间保持映射，任何提前返回都要关闭
+    try:
+        if len(program) == 0:
+            print("文件中没有可播放的指令。")
+            return 1
+        if not open_serial(args, serial_mgr, servo_ctrl):
+            return 1
+        return _play_loop(args, serial_mgr, program)
+    finally:
+        if closer is not None:
+            closer.close()
+
+
+def _play_loop(args, serial_mgr, program) -> int:
+    """按 --loop 次数播放，结束或中断后关闭串口"""
+    done = threading.Event()
+    result = {}
+
+    def on_finished(completed):
+        result["completed"] = completed
+        done.set()
+
+    engine = PlaybackEngine(serial_mgr, on_finished=on_finished)
+    try:
+        for n in range(args.loop):
+            done.clear()
+            print(f"播放 {args.file}（第 {n + 1}/{args.loop} 遍，{program.total_ms}ms）")
+            if not engine.play(program):
+                return 1
+            # 用带超时的 wait，保证 Ctrl+C 能及时响应
+            while not done.wait(0.2):
+                pass
+            stats = engine.scheduler.summary()
+            print(f"节拍误差：{stats['steps']} 步，最大迟到 {stats['max_ms']:.2f}ms，平均 {stats['mean_ms']:.2f}ms")
+            if not result.get("completed"):
+                return 1
+    except KeyboardInterrupt:
+        print("已中断，停止播放。")
+        engine.stop()
+        return 130
+    finally:
+        serial_mgr.flush(timeout=2.0)
+        serial_mgr.close()
+    return 0
+
+
+def cmd_probe(args) -> int:
+    serial_mgr = _serial_manager()
+    servo_ctrl = ServoController(serial_mgr)
+    if not serial_mgr.open(args.port, BAUD_RATES[0], write_timeout=args.write_timeout):
+        return 1
+    try:
+        baudrate = servo_ctrl.detect_baudrate(servo_ids=args.ids)
+    finally:
+        serial_mgr.close()
+    if baudrate is None:
+        return 1
+    print(baudrate)
+    return 0
+
+
+def cmd_check(args) -> int:
+    if _is_binary(args.file):
+        with ChoreoFile(args.file) as f:
+            print(f"二进制编舞文件 v{f.version}：{f.count} 条记录，总时长 {f.total_ms}ms")
+        return 0
+    text = _read_text(args.file)
+    if _looks_like_frames(text):
+        group = ActionGroup()
+        group.from_lines(text.split('\n'))
+        print(f"动作组：{len(group)} 帧")
+        return 0
+    result = parse_script(text)
+    delays = sum(ins.delay_ms for ins in result.instructions if hasattr(ins, "delay_ms"))
+    print(f"脚本：{result.line_count} 行，{len(result.instructions)} 条指令，总延时 {delays}ms")
+    for err in result.errors:
+        print(f"  第 {err.line} 行：{err.message}：{err.text}")
+    return 1 if result.errors else 0
+
+
+def cmd_analyze(args) -> int:
+    if _is_binary(args.file):
+        with ChoreoFile(args.file) as f:
+            if f.kind == KIND_SCRIPT:
+                bursts = bursts_from_program(f)
+            else:
+                bursts = bursts_from_action_group(f.to_action_group())
+    else:
+        text = _read_text(args.file)
+        if _looks_like_frames(text):
+            group = ActionGroup()
+            group.from_lines(text.split('\n'))
+            bursts = bursts_from_action_group(group)
+        else:
+            bursts = bursts_from_script(text)
+    report = analyze(bursts, args.baud, args.window, args.tolerance)
+    print(report.format(args.limit))
+    return 0 if report.ok else 1
+
+
+def cmd_convert(args) -> int:
+    servo_ctrl = ServoController(None)
+    if _is_binary(args.src):
+        with ChoreoFile(args.src) as f:
+            if f.kind == KIND_SCRIPT:
+                text = f.to_script()
+            else:
+                text = "\n".join(f.to_action_group().to_lines())
+        with open(args.dst, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+    else:
+        text = _read_text(args.src)
+        if _looks_like_frames(text):
+            group = ActionGroup()
+            group.from_lines(text.split('\n'))
+            write_frames(args.dst, group)
+        else:
+            write_script(args.dst, text, servo_ctrl)
+    print(f"已转换: {args.src} -> {args.dst}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="servo_player", description="串口舵机无界面播放器")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("play", help="通过串口播放编舞文件")
+    p.add_argument("file")
+    p.add_argument("--port", required=True, help="串口设备，如 /dev/ttyUSB0 或 COM3")
+    p.add_argument("--baud", type=_baud_arg, default=115200, help="波特率，auto 表示自动探测")
+    p.add_argument("--write-timeout", type=float, default=1.0, help="写超时（秒）")
+    p.add_argument("--loop", type=int, default=1, help="循环播放次数")
+    p.set_defaults(func=cmd_play)
+
+    p = sub.add_parser("probe", help="依次尝试常用波特率，探测总线舵机的波特率")
+    p.add_argument("--port", required=True)
+    p.add_argument("--ids", type=int, nargs="+", default=[1], help="用于探测的舵机 ID")
+    p.add_argument("--write-timeout", type=float, default=1.0, help="写超时（秒）")
+    p.set_defaults(func=cmd_probe)
+
+    p = sub.add_parser("check", help="检查编舞文件并报告错误")
+    p.add_argument("file")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("analyze", help="按波特率分析总线占用率与迟到指令")
+    p.add_argument("file")
+    p.add_argument("--baud", type=int, default=115200)
+    p.add_argument("--window", type=int, default=50, help="占用率统计窗口（毫秒）")
+    p.add_argument("--tolerance", type=float, default=1.0, help="排队超过多少毫秒算迟到")
+    p.add_argument("--limit", type=int, default=20, help="最多列出的迟到指令条数")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("convert", help="文本脚本/动作组 与 .svc 二进制文件互转")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p.set_defaults(func=cmd_convert)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
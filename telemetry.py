@@ -0,0 +1,176 @@
+"""
+telemetry.py
+舵机遥测：后台线程轮询 1..24 号舵机的位置，并穿插读取温度与电压
+默认一问一答（单线半双工总线上请求会与应答冲突）；全双工或带方向控制的适配器
+可通过 pipeline 参数让多个请求同时在途。最新读数存放在紧凑的数组表中
+注意：轮询期间不要再调用 ServoController.query，二者会争抢接收数据
+"""
+import threading
+import time
+from array import array
+from collections import deque
+from servo_controller import (
+    FrameParser, parse_reading, PositionReading, VoltageReading, TemperatureReading,
+    CMD_POS_READ, CMD_VIN_READ, CMD_TEMP_READ, SERVO_COUNT,
+)
+
+PIPELINE_DEPTH = 1     # 同时在途的读请求数；只有确认总线不会冲突时才调大
+REPLY_TIMEOUT = 0.02   # 单个请求等待应答的超时（秒）
+
+
+class TelemetryTable:
+    """
+    每个舵机最新一次读数，按舵机 ID 下标存放（下标 0 不用）
+    时间戳为 time.monotonic()，0 表示尚未读到
+    """
+    def __init__(self, servo_count: int = SERVO_COUNT):
+        n = servo_count + 1
+        self.position = array("h", [0]) * n
+        self.voltage_mv = array("H", [0]) * n
+        self.temperature = array("B", [0]) * n
+        self.position_time = array("d", [0.0]) * n
+        self.voltage_time = array("d", [0.0]) * n
+        self.temperature_time = array("d", [0.0]) * n
+        self.timeouts = array("I", [0]) * n
+
+    def update(self, reading, t: float):
+        sid = reading.servo_id
+        if not 0 < sid < len(self.position):
+            return
+        if isinstance(reading, PositionReading):
+            self.position[sid] = reading.position
+            self.position_time[sid] = t
+        elif isinstance(reading, VoltageReading):
+            self.voltage_mv[sid] = reading.millivolts
+            self.voltage_time[sid] = t
+        elif isinstance(reading, TemperatureReading):
+            self.temperature[sid] = reading.celsius
+            self.temperature_time[sid] = t
+
+    def snapshot(self, servo_id: int) -> dict:
+        return {
+            "position": self.position[servo_id],
+            "angle": self.position[servo_id] * 240 / 1000,
+            "voltage_mv": self.voltage_mv[servo_id],
+            "temperature": self.temperature[servo_id],
+            "position_time": self.position_time[servo_id],
+            "temperature_time": self.temperature_time[servo_id],
+            "timeouts": self.timeouts[servo_id],
+        }
+
+
+class TelemetryPoller:
+    def __init__(self, servo_ctrl, servo_ids=None, pipeline: int = PIPELINE_DEPTH,
+                 reply_timeout: float = REPLY_TIMEOUT, on_sample=None):
+        """
+        :param servo_ctrl: ServoController，用于组读指令包
+        :param servo_ids: 轮询的舵机 ID，默认 1..24
+        :param pipeline: 同时在途的请求数，默认 1；单线半双工总线上大于 1 会使请求与应答冲突
+        :param reply_timeout: 应答超时（秒），超时的请求记入 timeouts
+        :param on_sample: 回调 (reading, t)，每收到一个读数调用一次（轮询线程中）
+        """
+        self.servo_ctrl = servo_ctrl
+        self.serial_mgr = servo_ctrl.serial_mgr
+        self.servo_ids = list(servo_ids or range(1, SERVO_COUNT + 1))
+        self.pipeline = max(1, pipeline)
+        self.reply_timeout = reply_timeout
+        self.on_sample = on_sample
+        self.table = TelemetryTable(max(SERVO_COUNT, max(self.servo_ids)))
+
+        self.sweep_count = 0
+        self.sweep_rate = 0.0   # 平滑后的完整扫描频率 (Hz)
+        self._last_sweep = 0.0
+        self._parser = FrameParser()
+        self._running = False
+        self._thread = None
+
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        if not self.serial_mgr.is_open():
+            self.serial_mgr.log("串口未打开，无法启动遥测。")
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TelemetryPoller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _schedule(self):
+        """
+        请求序列：每轮扫描读取所有舵机位置，
+        轮末再对其中一个舵机（依次轮换）读取温度与电压
+        """
+        slow = 0
+        while True:
+            for sid in self.servo_ids:
+                yield sid, CMD_POS_READ
+            self._sweep_done()
+            sid = self.servo_ids[slow % len(self.servo_ids)]
+            slow += 1
+            yield sid, CMD_TEMP_READ
+            yield sid, CMD_VIN_READ
+
+    def _sweep_done(self):
+        now = time.monotonic()
+        if self._last_sweep:
+            rate = 1.0 / max(now - self._last_sweep, 1e-9)
+            # 指数平滑，避免单次抖动
+            self.sweep_rate = rate if not self.sweep_rate else self.sweep_rate * 0.8 + rate * 0.2
+        self._last_sweep = now
+        self.sweep_count += 1
+
+    def _run(self):
+        serial_mgr = self.serial_mgr
+        pack_read = self.servo_ctrl.pack_read
+        table = self.table
+        schedule = self._schedule()
+        inflight = deque()  # (servo_id, cmd, 发送时间)
+        serial_mgr.clear_input()
+        self._parser.reset()
+        self._last_sweep = 0.0
+        try:
+            while self._running and serial_mgr.is_open():
+                # 补满流水线
+                while len(inflight) < self.pipeline:
+                    sid, cmd = next(schedule)
+                    if not serial_mgr.write_bytes(pack_read(sid, cmd)):
+                        return
+                    inflight.append((sid, cmd, time.monotonic()))
+
+                wait = inflight[0][2] + self.reply_timeout - time.monotonic()
+                data = serial_mgr.read_bytes(1, max(wait, 0.001))
+                now = time.monotonic()
+                for frame in self._parser.feed(data):
+                    reading = parse_reading(frame)
+                    if reading is None:
+                        continue  # 回显的请求帧或其他指令
+                    key = (frame.servo_id, frame.cmd)
+                    if any(req[:2] == key for req in inflight):
+                        # 应答按顺序返回，排在它之前仍未应答的请求视为丢失
+                        while inflight[0][:2] != key:
+                            table.timeouts[inflight.popleft()[0]] += 1
+                        inflight.popleft()
+                    table.update(reading, now)
+                    if self.on_sample:
+                        self.on_sample(reading, now)
+
+                while inflight and now - inflight[0][2] > self.reply_timeout:
+                    table.timeouts[inflight.popleft()[0]] += 1
+        finally:
+            self._running = False
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweep_count,
+            "sweep_rate_hz": self.sweep_rate,
+            "timeouts": sum(self.table.timeouts),
+            "bad_frames": self._parser.bad_frames,
+        }
@@ -0,0 +1,173 @@
+"""
+telemetry_log.py
+定长预分配的遥测环形缓冲区：按列存放 (时间, 舵机ID, 类型, 数值)，
+写满后覆盖最旧的数据，长时间监控内存占用恒定。
+安装了 NumPy 时统计查询直接在底层数组上向量化计算，并支持导出 .npy
+"""
+import csv
+import threading
+import time
+from array import array
+from servo_controller import (
+    PositionReading, VoltageReading, TemperatureReading, SERVO_COUNT,
+    DO_PACKET_SIZE, CMD_DO, pos_to_angle,
+)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 可选
+    np = None
+
+KIND_COMMAND = 0      # 下发的目标角度 (°)
+KIND_POSITION = 1     # 读回的角度 (°)
+KIND_VOLTAGE = 2      # 电压 (mV)
+KIND_TEMPERATURE = 3  # 温度 (℃)
+KIND_NAMES = {
+    KIND_COMMAND: "command",
+    KIND_POSITION: "position",
+    KIND_VOLTAGE: "voltage",
+    KIND_TEMPERATURE: "temperature",
+}
+
+DEFAULT_CAPACITY = 1_000_000
+
+
+class TelemetryRecorder:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = max(1, capacity)
+        self.t = array("d", [0.0]) * self.capacity
+        self.servo_id = array("B", [0]) * self.capacity
+        self.kind = array("B", [0]) * self.capacity
+        self.value = array("f", [0.0]) * self.capacity
+        self._head = 0     # 下一个写入位置
+        self._count = 0    # 有效样本数
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        with self._lock:
+            self._head = self._count = 0
+
+    def record(self, servo_id: int, kind: int, value: float, t: float = None):
+        if t is None:
+            t = time.monotonic()
+        with self._lock:
+            i = self._head
+            self.t[i] = t
+            self.servo_id[i] = servo_id
+            self.kind[i] = kind
+            self.value[i] = value
+            self._head = (i + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def record_command(self, servo_id: int, angle_deg: float, t: float = None):
+        self.record(servo_id, KIND_COMMAND, angle_deg, t)
+
+    def record_packets(self, data, t: float = None):
+        """
+        记录一段预组好的 DO 指令包（PlaybackEngine 直接写出的字节），
+        从每个 10 字节包中取出舵机 ID 与目标位置换算为角度
+        """
+        if t is None:
+            t = time.monotonic()
+        view = memoryview(data)
+        for off in range(0, len(view) - DO_PACKET_SIZE + 1, DO_PACKET_SIZE):
+            if view[off + 4] == CMD_DO:
+                self.record(view[off + 2], KIND_COMMAND, pos_to_angle(view[off + 5] | view[off + 6] << 8), t)
+
+    def record_reading(self, reading, t: float = None):
+        """记录 ServoController 读回的数据（可直接作为 TelemetryPoller 的 on_sample）"""
+        if isinstance(reading, PositionReading):
+            self.record(reading.servo_id, KIND_POSITION, reading.angle, t)
+        elif isinstance(reading, VoltageReading):
+            self.record(reading.servo_id, KIND_VOLTAGE, reading.millivolts, t)
+        elif isinstance(reading, TemperatureReading):
+            self.record(reading.servo_id, KIND_TEMPERATURE, reading.celsius, t)
+
+    def _order(self):
+        """按时间先后返回有效区间 [(起, 止), ...]"""
+        if self._count < self.capacity:
+            return [(0, self._count)]
+        return [(self._head, self.capacity), (0, self._head)]
+
+    def rows(self):
+        """按时间先后迭代 (t, servo_id, kind, value)"""
+        for start, end in self._order():
+            for i in range(start, end):
+                yield self.t[i], self.servo_id[i], self.kind[i], self.value[i]
+
+    def to_numpy(self):
+        """按时间先后返回结构化数组（需要 NumPy）"""
+        if np is None:
+            raise RuntimeError("导出 NumPy 数组需要安装 numpy")
+        dtype = np.dtype([("t", "f8"), ("servo_id", "u1"), ("kind", "u1"), ("value", "f4")])
+        out = np.empty(self._count, dtype=dtype)
+        pos = 0
+        for start, end in self._order():
+            n = end - start
+            out["t"][pos:pos + n] = np.frombuffer(self.t, dtype="f8")[start:end]
+            out["servo_id"][pos:pos + n] = np.frombuffer(self.servo_id, dtype="u1")[start:end]
+            out["kind"][pos:pos + n] = np.frombuffer(self.kind, dtype="u1")[start:end]
+            out["value"][pos:pos + n] = np.frombuffer(self.value, dtype="f4")[start:end]
+            pos += n
+        return out
+
+    def stats(self, kind: int, since: float = None, until: float = None) -> dict:
+        """
+        统计时间窗口 [since, until] 内每个舵机的 min/max/mean/count
+        返回 {servo_id: {"min":..., "max":..., "mean":..., "count":...}}
+        """
+        if np is not None:
+            return self._stats_numpy(kind, since, until)
+        acc = {}
+        for t, sid, k, v in self.rows():
+            if k != kind or (since is not None and t < since) or (until is not None and t > until):
+                continue
+            a = acc.get(sid)
+            if a is None:
+                acc[sid] = [v, v, v, 1]
+            else:
+                a[0] = min(a[0], v)
+                a[1] = max(a[1], v)
+                a[2] += v
+                a[3] += 1
+        return {sid: {"min": a[0], "max": a[1], "mean": a[2] / a[3], "count": a[3]}
+                for sid, a in sorted(acc.items())}
+
+    def _stats_numpy(self, kind, since, until):
+        n = self._count
+        t = np.frombuffer(self.t, dtype="f8")[:n]
+        sid = np.frombuffer(self.servo_id, dtype="u1")[:n]
+        value = np.frombuffer(self.value, dtype="f4")[:n]
+        mask = np.frombuffer(self.kind, dtype="u1")[:n] == kind
+        if since is not None:
+            mask &= t >= since
+        if until is not None:
+            mask &= t <= until
+        sid = sid[mask]
+        value = value[mask].astype("f8")
+        size = max(SERVO_COUNT, int(sid.max()) if sid.size else 0) + 1
+        count = np.bincount(sid, minlength=size)
+        total = np.bincount(sid, weights=value, minlength=size)
+        vmin = np.full(size, np.inf)
+        vmax = np.full(size, -np.inf)
+        np.minimum.at(vmin, sid, value)
+        np.maximum.at(vmax, sid, value)
+        return {int(i): {"min": float(vmin[i]), "max": float(vmax[i]),
+                         "mean": float(total[i] / count[i]), "count": int(count[i])}
+                for i in np.nonzero(count)[0]}
+
+    def export_csv(self, path: str):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["t", "servo_id", "kind", "value"])
+            for t, sid, k, v in self.rows():
+                writer.writerow([f"{t:.6f}", sid, KIND_NAMES.get(k, k), f"{v:g}"])
+
+    def export_npy(self, path: str):
+        """导出为 .npy 结构化数组（需要 NumPy）"""
+        data = self.to_numpy()
+        np.save(path, data)
@@ -0,0 +1,186 @@
+"""
+trajectory.py
+关键帧之间的轨迹插值（linear / cubic / minjerk），对 24 路关节一次性向量化计算（需要 NumPy）
+TrajectoryProgram 按固定频率惰性生成设定点，可直接交给 PlaybackEngine 播放，
+不会预先展开整段动作的全部采样点
+"""
+import math
+import numpy as np
+from dance_program import OP_SEND, OP_DELAY
+from servo_controller import DO_PACKET_SIZE
+
+METHODS = ("linear", "cubic", "minjerk")
+ANGLE_MIN = 0
+ANGLE_MAX = 240
+
+
+class Keyframes:
+    """
+    关键帧序列
+    times_ms: 形状 (n,) 的时间点（毫秒，严格递增）
+    poses:    形状 (n, joints) 的角度
+    """
+    def __init__(self, times_ms, poses):
+        self.times_ms = np.asarray(times_ms, dtype=np.float64)
+        self.poses = np.atleast_2d(np.asarray(poses, dtype=np.float64))
+        if self.times_ms.ndim != 1 or len(self.times_ms) != len(self.poses):
+            raise ValueError("关键帧时间与姿态数量不一致")
+        if len(self.times_ms) < 1:
+            raise ValueError("至少需要一个关键帧")
+        if np.any(np.diff(self.times_ms) <= 0):
+            raise ValueError("关键帧时间必须严格递增")
+
+    def __len__(self):
+        return len(self.times_ms)
+
+    @property
+    def joints(self) -> int:
+        return self.poses.shape[1]
+
+    @classmethod
+    def from_action_group(cls, group, start_ms: float = 0):
+        """
+        由 ActionGroup 生成关键帧：每帧持续时间取该帧各舵机运行时间的最大值，
+        第一帧位于 start_ms
+        """
+        times, poses = [], []
+        t = start_ms
+        for frame in group.frames:
+            times.append(t)
+            poses.append(list(frame.angles))
+            t += max(max(frame.times), 1)
+        return cls(times, poses)
+
+
+class Trajectory:
+    def __init__(self, keyframes: Keyframes, method: str = "linear"):
+        if method not in METHODS:
+            raise ValueError(f"未知插值方式: {method}（可选 {', '.join(METHODS)}）")
+        self.keyframes = keyframes
+        self.method = method
+        self._tangents = self._catmull_rom_tangents() if method == "cubic" else None
+
+    @property
+    def start_ms(self) -> float:
+        return float(self.keyframes.times_ms[0])
+
+    @property
+    def duration_ms(self) -> float:
+        times = self.keyframes.times_ms
+        return float(times[-1] - times[0])
+
+    def _catmull_rom_tangents(self):
+        """各关键帧处的速度（度/毫秒）：内部点取两侧差商，首尾为 0（静止起停）"""
+        times, poses = self.keyframes.times_ms, self.keyframes.poses
+        m = np.zeros_like(poses)
+        if len(times) > 2:
+            m[1:-1] = (poses[2:] - poses[:-2]) / (times[2:] - times[:-2])[:, None]
+        return m
+
+    def evaluate(self, t_ms) -> np.ndarray:
+        """计算时间点 t_ms（标量或一维数组）处的姿态，返回形状 (k, joints)"""
+        times, poses = self.keyframes.times_ms, self.keyframes.poses
+        t = np.atleast_1d(np.asarray(t_ms, dtype=np.float64))
+        if len(times) == 1:
+            return np.repeat(poses[:1], len(t), axis=0)
+        t = np.clip(t, times[0], times[-1])
+        seg = np.clip(np.searchsorted(times, t, side="right") - 1, 0, len(times) - 2)
+        t0 = times[seg]
+        h = times[seg + 1] - t0
+        u = ((t - t0) / h)[:, None]
+        p0 = poses[seg]
+        p1 = poses[seg + 1]
+
+        if self.method == "linear":
+            out = p0 + (p1 - p0) * u
+        elif self.method == "minjerk":
+            # 最小加加速度：s(u) = 10u^3 - 15u^4 + 6u^5，段首尾速度、加速度为 0
+            s = u * u * u * (10 + u * (-15 + 6 * u))
+            out = p0 + (p1 - p0) * s
+        else:
+            # 三次 Hermite（Catmull-Rom 切线）
+            m0 = self._tangents[seg] * h[:, None]
+            m1 = self._tangents[seg + 1] * h[:, None]
+            u2 = u * u
+            u3 = u2 * u
+            out = ((2 * u3 - 3 * u2 + 1) * p0 + (u3 - 2 * u2 + u) * m0
+                   + (-2 * u3 + 3 * u2) * p1 + (u3 - u2) * m1)
+        return np.clip(out, ANGLE_MIN, ANGLE_MAX)
+
+    def iter_blocks(self, rate_hz: float, block: int = 256):
+        """按采样频率分块惰性产出 (t_ms[k], poses[k, joints])，每块最多 block 个采样点"""
+        period = 1000.0 / rate_hz
+        count = self.sample_count(rate_hz)
+        end = self.start_ms + self.duration_ms
+        for first in range(0, count, block):
+            idx = np.arange(first, min(first + block, count))
+            # 最后一个采样点落在末关键帧上
+            t = np.minimum(self.start_ms + idx * period, end)
+            yield t, self.evaluate(t)
+
+    def iter_samples(self, rate_hz: float, block: int = 256):
+        """逐点惰性产出 (t_ms, pose)"""
+        for t, poses in self.iter_blocks(rate_hz, block):
+            yield from zip(t, poses)
+
+    def sample_count(self, rate_hz: float) -> int:
+        """采样点数，时长不是周期整数倍时末尾补一个末关键帧采样点"""
+        return math.ceil(self.duration_ms * rate_hz / 1000) + 1
+
+
+def pack_poses(servo_ctrl, servo_ids, angles, time_ms: int) -> bytes:
+    """向量化组包：一帧内所有舵机的 DO 指令包拼接为一段字节"""
+    ids = np.asarray(servo_ids, dtype=np.uint8)
+    pos = (np.asarray(angles, dtype=np.float64) * 1000 / 240).astype(np.int64)
+    buf = np.empty((len(ids), DO_PACKET_SIZE), dtype=np.uint8)
+    buf[:, 0] = servo_ctrl.HEAD
+    buf[:, 1] = servo_ctrl.HEAD
+    buf[:, 2] = ids
+    buf[:, 3] = servo_ctrl.LEN_DO
+    buf[:, 4] = servo_ctrl.CMD_DO
+    buf[:, 5] = pos & 0xFF
+    buf[:, 6] = (pos >> 8) & 0xFF
+    buf[:, 7] = time_ms & 0xFF
+    buf[:, 8] = (time_ms >> 8) & 0xFF
+    buf[:, 9] = ~buf[:, 2:9].sum(axis=1, dtype=np.int64) & 0xFF
+    return buf.tobytes()
+
+
+class TrajectoryProgram:
+    """
+    把轨迹按固定频率转换为 PlaybackEngine 可播放的指令流：
+    偶数步发送一帧设定点，奇数步延时一个周期；每一步都在访问时才计算。
+    时长不是周期整数倍时，最后一段延时缩短，保证末关键帧的姿态一定会发出
+    """
+    def __init__(self, trajectory: Trajectory, servo_ctrl, rate_hz: float = 50, servo_ids=None):
+        self.trajectory = trajectory
+        self.servo_ctrl = servo_ctrl
+        self.period_ms = max(1, int(round(1000 / rate_hz)))
+        self.servo_ids = list(servo_ids or range(1, trajectory.keyframes.joints + 1))
+        if len(self.servo_ids) != trajectory.keyframes.joints:
+            raise ValueError(f"舵机数量 ({len(self.servo_ids)}) 与关键帧关节数不一致")
+        self.total_ms = math.ceil(trajectory.duration_ms)
+        self.samples = -(-self.total_ms // self.period_ms) + 1
+        self.move_count = self.samples * len(self.servo_ids)
+
+    def __len__(self):
+        return self.samples * 2 - 1
+
+    def _sample_ms(self, sample: int) -> int:
+        """第 sample 个设定点相对起点的时刻，最后一个截到末关键帧"""
+        t = sample * self.period_ms
+        return t if t < self.total_ms else self.total_ms
+
+    def offset_ms(self, index: int) -> int:
+        return self._sample_ms((index + 1) // 2)
+
+    def step(self, index: int):
+        sample = index // 2
+        if index % 2:
+            return OP_DELAY, self._sample_ms(sample + 1) - self._sample_ms(sample)
+        if sample == self.samples - 1:
+            t = self.trajectory.start_ms + self.trajectory.duration_ms
+        else:
+            t = self.trajectory.start_ms + sample * self.period_ms
+        angles = self.trajectory.evaluate(t)[0]
+        return OP_SEND, pack_poses(self.servo_ctrl, self.servo_ids, angles, self.period_ms)
@@ -16,9 +16,9 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
 from PySide6.QtWidgets import (QApplication, QComboBox, QFrame, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QSizePolicy,
-    QSlider, QSpinBox, QTabWidget, QTextEdit,
-    QVBoxLayout, QWidget)
+    QLabel, QLineEdit, QPlainTextEdit, QPushButton,
+    QSizePolicy, QSlider, QSpinBox, QTabWidget,
+    QTextEdit, QVBoxLayout, QWidget)
 
 class Ui_Form(object):
     def setupUi(self, Form):
@@ -2592,7 +2592,7 @@ class Ui_Form(object):
         self.pushButton_init_2.setObjectName(u"pushButton_init_2")
         self.pushButton_init_2.setGeometry(QRect(400, 300, 151, 41))
         self.pushButton_init_2.setFont(font1)
-        self.textedit_output = QTextEdit(self.tab_2)
+        self.textedit_output = QPlainTextEdit(self.tab_2)
         self.textedit_output.setObjectName(u"textedit_output")
         self.textedit_output.setGeometry(QRect(560, 10, 411, 321))
         self.tabWidget.addTab(self.tab_2, "")